@@ -0,0 +1,69 @@
+"""
+Benchmark: contact search keystroke latency on a synthetic 10k-contact address book
+
+Compares the original linear substring scan with ContactSearchIndex while
+"typing" and then backspacing a set of queries.
+
+Usage: python3 benchmarks/bench_contact_search.py [contacts]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from whatsapp import ContactSearchIndex  # noqa: E402
+from synthetic import make_contacts  # noqa: E402
+
+QUERIES = ["maria garcia", "jose", "luis mar", "work", "emma w", "sanch"]
+
+
+def linear_search(contacts, query):
+    """search_contacts as it was before ContactSearchIndex"""
+    query_lower = query.lower().strip()
+    return [contact for contact in contacts if query_lower in contact.get("name", "").lower()]
+
+
+def keystrokes(query):
+    """Typing the query one character at a time, then deleting it again"""
+    typed = [query[:i] for i in range(1, len(query) + 1)]
+    return typed + typed[-2::-1]
+
+
+def time_per_keystroke(search, queries):
+    timings = []
+    for query in queries:
+        for text in keystrokes(query):
+            start = time.perf_counter()
+            search(text)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.95)]
+
+
+def run(count=10000):
+    contacts = make_contacts(count)
+
+    start = time.perf_counter()
+    index = ContactSearchIndex(contacts)
+    build = time.perf_counter() - start
+
+    linear_avg, linear_p95 = time_per_keystroke(lambda q: linear_search(contacts, q), QUERIES)
+    index_avg, index_p95 = time_per_keystroke(index.search, QUERIES)
+
+    # Same contacts found for plain ASCII queries (the index additionally folds accents)
+    mismatches = sum(1 for query in ["garcia", "emma", "work", "ll"]
+                     if not {c["id"] for c in linear_search(contacts, query)} <= {c["id"] for c in index.search(query)})
+
+    print(f"contacts: {count}  index build: {build * 1000:.1f} ms  missing results: {mismatches}")
+    print(f"linear scan       : avg {linear_avg * 1000:7.3f} ms  p95 {linear_p95 * 1000:7.3f} ms per keystroke")
+    print(f"ContactSearchIndex: avg {index_avg * 1000:7.3f} ms  p95 {index_p95 * 1000:7.3f} ms per keystroke "
+          f"({linear_avg / index_avg:.1f}x)")
+    return mismatches
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sys.exit(1 if run(count) else 0)
@@ -0,0 +1,130 @@
+"""
+Memory benchmark: RSS of a large synthetic account held as plain dicts vs __slots__ records
+
+Each representation is built in a fresh interpreter from JSON files (the way
+backend responses arrive, so equal strings are separate objects unless interned)
+and the growth of the resident set is reported:
+
+  dicts:   contacts and messages as the dicts load_contacts_sync/text_messages
+           used to build, chats as the raw /chats JSON (nested lastMessage included)
+  records: Contact / Chat / Message
+
+Usage: python3 benchmarks/bench_memory.py [--contacts 10000] [--chats 2000] [--messages 5000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+MODES = ("dicts", "records")
+
+
+def rss_kb():
+    """Current resident set size in KB (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def legacy_contact(contact):
+    """load_contacts_sync before Contact records"""
+    name = contact.get("name", "").strip()
+    return {"id": contact.get("id", ""), "name": name, "phone": contact.get("phone", ""),
+            "pushname": contact.get("pushname", name)}
+
+
+def legacy_message(msg):
+    """text_messages before Message records"""
+    return {
+        "id": msg.get("id", str(time.time())),
+        "body": msg.get("body"),
+        "fromMe": msg.get("fromMe", False),
+        "timestamp": msg.get("timestamp", int(time.time())),
+        "type": msg.get("type", "chat"),
+        "author": msg.get("author", ""),
+        "participant": msg.get("participant", ""),
+    }
+
+
+def load(data_dir, name):
+    with open(os.path.join(data_dir, name + ".json")) as f:
+        return json.loads(f.read())
+
+
+def child(mode, data_dir):
+    from whatsapp import Chat, Contact, Message
+
+    gc.collect()
+    before = rss_kb()
+    if mode == "dicts":
+        contacts = [legacy_contact(contact) for contact in load(data_dir, "contacts")]
+        chats = load(data_dir, "chats")
+        messages = [legacy_message(message) for message in load(data_dir, "messages")]
+    else:
+        contacts = Contact.from_list(load(data_dir, "contacts"))
+        chats = Chat.from_list(load(data_dir, "chats"))
+        messages = Message.from_list(load(data_dir, "messages"))
+    gc.collect()
+    after = rss_kb()
+    print(json.dumps({"mode": mode, "before_kb": before, "after_kb": after,
+                      "counts": [len(contacts), len(chats), len(messages)]}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.data)
+        return 0
+
+    from synthetic import make_chats, make_contacts, make_group_messages
+    contacts = make_contacts(args.contacts)
+    participants = [contact["id"] for contact in contacts[::max(1, args.contacts // 40)]]
+    dataset = {"contacts": contacts, "chats": make_chats(args.chats),
+               "messages": make_group_messages(args.messages, participants)}
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="whatsapp-mem-") as data_dir:
+        for name, items in dataset.items():
+            with open(os.path.join(data_dir, name + ".json"), "w") as f:
+                json.dump(items, f)
+        for mode in MODES:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--data", data_dir],
+                                    capture_output=True, text=True, check=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"dataset: {args.contacts} contacts, {args.chats} chats, {args.messages} messages")
+    for mode in MODES:
+        result = results[mode]
+        grown = result["after_kb"] - result["before_kb"]
+        print(f"{mode:8s} RSS {result['before_kb'] / 1024:7.1f} -> {result['after_kb'] / 1024:7.1f} MB "
+              f"(+{grown / 1024:6.1f} MB)")
+    legacy = results["dicts"]["after_kb"] - results["dicts"]["before_kb"]
+    compact = results["records"]["after_kb"] - results["records"]["before_kb"]
+    if compact > 0:
+        print(f"records use {legacy / compact:.1f}x less memory ({(legacy - compact) / 1024:.1f} MB saved)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark: TextSanitizer vs the original per-character filter_text_only
+
+Usage: python3 benchmarks/bench_sanitizer.py [iterations]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from whatsapp import TextSanitizer  # noqa: E402
+
+
+def legacy_filter_text_only(text):
+    """filter_text_only as it was before TextSanitizer (kept verbatim for comparison)"""
+    if not text:
+        return ""
+
+    try:
+        text = str(text) if text is not None else ""
+
+        multimedia_patterns = [
+            "image omitted", "video omitted", "audio omitted", "document omitted",
+            "sticker omitted", "gif omitted", "location omitted", "contact omitted",
+            "[IMAGE]", "[VIDEO]", "[AUDIO]", "[DOCUMENT]", "[STICKER]", "[GIF]",
+            "[LOCATION]", "[CONTACT]", "📷", "🎥", "🎵", "📄", "📍"
+        ]
+
+        text_lower = text.lower()
+        for pattern in multimedia_patterns:
+            if pattern.lower() in text_lower:
+                return "[Media content]"
+
+        text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[Link]', text)
+        text = re.sub(r'www\.(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[Link]', text)
+
+        filtered_chars = []
+        for char in text:
+            try:
+                if ord(char) <= 0xFFFF:
+                    if (ord(char) < 32 and char not in '\n\r\t') or \
+                       (0x2600 <= ord(char) <= 0x26FF) or \
+                       (0x2700 <= ord(char) <= 0x27BF) or \
+                       (0x1F600 <= ord(char) <= 0x1F64F) or \
+                       (0x1F300 <= ord(char) <= 0x1F5FF) or \
+                       (0x1F680 <= ord(char) <= 0x1F6FF) or \
+                       (0x1F1E6 <= ord(char) <= 0x1F1FF):
+                        continue
+                    else:
+                        filtered_chars.append(char)
+            except ValueError:
+                continue
+
+        filtered_text = ''.join(filtered_chars).strip()
+        if not filtered_text:
+            return "[Non-text content]"
+        if len(filtered_text) > 200:
+            filtered_text = filtered_text[:197] + "..."
+        return filtered_text
+
+    except Exception:
+        return "[Filtered content]"
+
+
+WORDS = ("hola que tal vamos mañana al cine a las ocho nos vemos en la puerta "
+         "ok perfect see you tomorrow did you get the document I sent yesterday").split()
+EXTRAS = ["😂", "👍", "❤", "☀", "✅", "🇪🇸", "https://example.com/a?b=c&d=1", "www.beepy.dev/docs",
+          "image omitted", "\t", "¿", "ü", "€"]
+
+
+def make_bodies(count, seed=42):
+    """Realistic chat bodies: short replies, long paragraphs, emoji, links and media markers"""
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(count):
+        length = rng.choice([2, 4, 8, 15, 40, 90])
+        parts = [rng.choice(WORDS) for _ in range(length)]
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(EXTRAS))
+        bodies.append(" ".join(parts))
+    return bodies
+
+
+def run(iterations=5, count=2000):
+    bodies = make_bodies(count)
+    ids = [f"false_{i}@c.us_{i:08X}" for i in range(count)]
+
+    mismatches = sum(1 for body in bodies if legacy_filter_text_only(body) != TextSanitizer()._sanitize(body))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for body in bodies:
+            legacy_filter_text_only(body)
+    legacy = (time.perf_counter() - start) / (iterations * count)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        sanitizer = TextSanitizer()
+        for body in bodies:
+            sanitizer.sanitize(body)
+    compiled = (time.perf_counter() - start) / (iterations * count)
+
+    sanitizer = TextSanitizer()
+    for body, message_id in zip(bodies, ids):
+        sanitizer.sanitize(body, message_id)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for body, message_id in zip(bodies, ids):
+            sanitizer.sanitize(body, message_id)
+    memoized = (time.perf_counter() - start) / (iterations * count)
+
+    print(f"bodies: {count}  iterations: {iterations}  output mismatches: {mismatches}")
+    print(f"legacy filter_text_only : {legacy * 1e6:8.2f} us/body")
+    print(f"TextSanitizer (cold)    : {compiled * 1e6:8.2f} us/body  ({legacy / compiled:5.1f}x)")
+    print(f"TextSanitizer (memo hit): {memoized * 1e6:8.2f} us/body  ({legacy / memoized:5.1f}x)")
+    return mismatches
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sys.exit(1 if run(iterations) else 0)
@@ -0,0 +1,249 @@
+"""
+Headless benchmark suite for the render and data paths of whatsapp.py
+
+Builds a WhatsApp instance on the SDL dummy driver (no backend, no background
+threads) with synthetic data - 1k chats, 10k contacts and a 5k-message group
+chat with long bodies - and times:
+
+  render: draw_chat_list, draw_contact_search, draw_chat_view (per frame, plus
+          the first frame of a chat and the redraw after a contacts sync)
+  data:   search_contacts, filter_text_only, update_input_lines, message ingestion
+
+Results are written as JSON; with --baseline, any p50 slower than the baseline
+by more than --tolerance is reported and the exit code is 1.
+
+Usage: python3 benchmarks/run_benchmarks.py [--output results.json] [--baseline old.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+# Never touch the real on-device cache
+os.environ["WHATSAPP_CACHE_DB"] = os.path.join(tempfile.mkdtemp(prefix="whatsapp-bench-"), "bench.db")
+
+import pygame  # noqa: E402
+import whatsapp  # noqa: E402
+from whatsapp import Chat, ContactSearchIndex, ConversationStore, FrameProfiler, TextSanitizer, WhatsApp  # noqa: E402
+from synthetic import make_chats, make_contacts, make_group_messages  # noqa: E402
+
+QUERIES = ["maria garcia", "jose", "luis mar", "work", "emma w", "sanch"]
+COMPOSE_TEXT = ("hola que tal vamos mañana al cine a las ocho nos vemos en la puerta del centro comercial "
+                "y luego cenamos algo por ahí si os parece bien a todos ") * 4
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 4),
+        "p50_ms": round(FrameProfiler.percentile(ordered, 0.50), 4),
+        "p95_ms": round(FrameProfiler.percentile(ordered, 0.95), 4),
+        "p99_ms": round(FrameProfiler.percentile(ordered, 0.99), 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def draw_frame(app, screen):
+    """One frame as main() renders it (minus the display flip)"""
+    screen.fill(whatsapp.BACKGROUND_COLOR)
+    app.draw(screen)
+    app.damage.end_frame()
+
+
+def bench_chat_list(app, screen, chats):
+    app.chats.reset(chats)
+    app.mode = "chat_list"
+    samples = []
+    for index in range(len(chats)):
+        app.selected_chat_index = index
+        samples.append(timed(draw_frame, app, screen))
+    return samples
+
+
+def bench_contact_search(app, screen):
+    app.mode = "contact_search"
+    search, draw = [], []
+    for query in QUERIES:
+        typed = [query[:i] for i in range(1, len(query) + 1)]
+        for text in typed + typed[-2::-1]:
+            app.search_input = text
+            search.append(timed(app.search_contacts, text))
+            draw.append(timed(draw_frame, app, screen))
+    return search, draw
+
+
+def bench_chat_view(app, screen, messages):
+    app.current_chat = Chat("120363000000@g.us", "Benchmark group", is_group=True)
+    app.current_messages = ConversationStore(messages, max_messages=len(messages))
+    app.layout_cache.clear()
+    app.mode = "chat_view"
+    app.compose_mode = False
+    app.message_scroll = 0
+
+    first = timed(draw_frame, app, screen)  # cold: wraps every message once
+    steady = []
+    max_scroll = getattr(app, "_max_message_scroll", 0)
+    for scroll in range(0, min(max_scroll, 2000), 5):
+        app.message_scroll = scroll
+        steady.append(timed(draw_frame, app, screen))
+    return first, steady
+
+
+def bench_contacts_resync(app, screen, contacts, participants, rounds=20):
+    """set_contacts (index prebuilt, as the sync worker does) + one frame, with the group chat open
+
+    Names change every other round (a few participants renamed and back), so
+    both the no-change path and re-wrapping the renamed authors' messages are timed.
+    """
+    app.mode = "chat_view"
+    app.message_scroll = 0
+    draw_frame(app, screen)
+    renamed_ids = set(participants[:3])
+    renamed = [dict(contact, name=contact["name"] + " R") if contact["id"] in renamed_ids else contact
+               for contact in contacts]
+    indexes = [ContactSearchIndex(contacts), ContactSearchIndex(renamed)]
+    samples = []
+    for round_index in range(rounds):
+        index = indexes[(round_index // 2) % 2]
+        start = time.perf_counter()
+        app.set_contacts(index.contacts, index)
+        draw_frame(app, screen)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_filter_text(app, messages):
+    whatsapp.TEXT_SANITIZER = TextSanitizer()  # cold caches
+    cold = [timed(app.filter_text_only, message["body"]) for message in messages]
+    for message in messages:
+        app.filter_text_only(message["body"], message["id"])
+    memo = [timed(app.filter_text_only, message["body"], message["id"]) for message in messages]
+    return cold, memo
+
+
+def bench_input_lines(app):
+    samples = []
+    app.message_input = ""
+    for char in COMPOSE_TEXT[:500]:
+        app.message_input += char
+        samples.append(timed(app.update_input_lines))
+    return samples
+
+
+def bench_ingestion(app, messages):
+    """add_incoming_message into an open chat (no disk: the local store is detached)"""
+    app.local_store = None
+    app.current_chat = Chat("120363000000@g.us", "Benchmark group", is_group=True)
+    app.current_messages = ConversationStore()
+    app.mode = "chat_view"
+    samples = [timed(app.add_incoming_message, message) for message in messages]
+    duplicates = [timed(app.add_incoming_message, message) for message in messages[-500:]]
+    return samples, duplicates
+
+
+def run(chat_count=1000, contact_count=10000, message_count=5000):
+    pygame.init()
+    screen = pygame.display.set_mode((400, 240))
+    app = WhatsApp(start_background=False)
+
+    chats = make_chats(chat_count)
+    contacts = make_contacts(contact_count)
+    participants = [contact["id"] for contact in contacts[::max(1, contact_count // 40)]]
+    messages = make_group_messages(message_count, participants)
+
+    start = time.perf_counter()
+    app.set_contacts(contacts)
+    set_contacts_ms = (time.perf_counter() - start) * 1000
+
+    results = {}
+    results["draw_chat_list"] = summarize(bench_chat_list(app, screen, chats))
+    search, draw = bench_contact_search(app, screen)
+    results["search_contacts"] = summarize(search)
+    results["draw_contact_search"] = summarize(draw)
+    first, steady = bench_chat_view(app, screen, messages)
+    results["draw_chat_view_first"] = summarize([first])
+    results["draw_chat_view"] = summarize(steady)
+    results["contacts_resync_redraw"] = summarize(bench_contacts_resync(app, screen, contacts, participants))
+    cold, memo = bench_filter_text(app, messages)
+    results["filter_text_only_cold"] = summarize(cold)
+    results["filter_text_only_memo"] = summarize(memo)
+    results["update_input_lines"] = summarize(bench_input_lines(app))
+    added, duplicates = bench_ingestion(app, messages)
+    results["ingest_message"] = summarize(added)
+    results["ingest_duplicate"] = summarize(duplicates)
+    results["set_contacts"] = summarize([set_contacts_ms])
+
+    app.cleanup()
+    pygame.quit()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "dataset": {"chats": chat_count, "contacts": contact_count, "group_messages": message_count},
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Benchmarks whose p50 got slower than the baseline by more than tolerance"""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, previous["p50_ms"], current["p50_ms"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--contacts", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    # The app's DEBUG prints would dominate the output (and the timings of the print-heavy paths)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = run(args.chats, args.contacts, args.messages)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, values in report["results"].items():
+        print(f"{name:24s} p50 {values['p50_ms']:9.3f} ms  p95 {values['p95_ms']:9.3f} ms  "
+              f"max {values['max_ms']:9.3f} ms  (n={values['count']})")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: p50 {before:.3f} -> {after:.3f} ms ({ratio:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Synthetic WhatsApp datasets for the benchmarks (deterministic for a given seed)
+"""
+
+import random
+
+FIRST_NAMES = ["Ana", "Luis", "María", "José", "Carmen", "Javier", "Lucía", "Pablo", "Sofía", "Diego",
+               "Elena", "Andrés", "Paula", "Miguel", "Laura", "Sergio", "Marta", "Raúl", "Irene", "Óscar",
+               "John", "Emma", "Oliver", "Chloe", "Noah", "Mia", "Liam", "Zoe", "Ethan", "Ava"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Fernández", "Díaz", "Ruiz",
+              "Hernández", "Jiménez", "Moreno", "Muñoz", "Álvarez", "Romero", "Smith", "Brown", "Taylor",
+              "Wilson", "Evans", "Walker", "Wright", "Hughes", "Green", "Hall"]
+TAGS = ["", "", "", " (work)", " Gym", " Beepy", " 🏠", " Madrid", " School"]
+
+
+def make_contacts(count, seed=1):
+    """Backend-shaped contact dicts, sorted by name like load_contacts_sync"""
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.choice(TAGS)}"
+        number = f"34{600000000 + i}"
+        contacts.append({
+            "id": f"{number}@c.us",
+            "name": name,
+            "phone": number,
+            "pushname": name.split()[0],
+        })
+    contacts.sort(key=lambda contact: contact["name"].lower())
+    return contacts
+
+
+WORDS = ("hola que tal vamos mañana al cine a las ocho nos vemos en la puerta ok perfect see you "
+         "tomorrow did you get the document I sent yesterday the meeting moved to friday afternoon "
+         "can someone bring the charger for the projector please").split()
+
+
+def make_chats(count, seed=2):
+    """Backend-shaped /chats entries, newest activity first"""
+    rng = random.Random(seed)
+    now = 1_700_000_000
+    chats = []
+    for i in range(count):
+        is_group = rng.random() < 0.25
+        name = (f"{rng.choice(LAST_NAMES)} {rng.choice(['family', 'team', 'trip', 'club'])}" if is_group
+                else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+        chats.append({
+            "id": f"{120363000000 + i}@g.us" if is_group else f"{34600000000 + i}@c.us",
+            "name": name,
+            "isGroup": is_group,
+            "unreadCount": rng.choice([0, 0, 0, 1, 3, 12]),
+            "lastMessage": {"body": " ".join(rng.choice(WORDS) for _ in range(8)),
+                            "timestamp": now - i * 97, "from": f"{34600000000 + i}@c.us"},
+        })
+    return chats
+
+
+def make_group_messages(count, participants, seed=3, long_ratio=0.3):
+    """Group chat messages (oldest first) from the given participant ids; ~30% long multi-paragraph bodies"""
+    rng = random.Random(seed)
+    start = 1_700_000_000 - count * 60
+    messages = []
+    for i in range(count):
+        length = rng.randint(60, 180) if rng.random() < long_ratio else rng.randint(2, 20)
+        from_me = rng.random() < 0.2
+        messages.append({
+            "id": f"false_120363000000@g.us_{i:010X}",
+            "body": " ".join(rng.choice(WORDS) for _ in range(length)),
+            "fromMe": from_me,
+            "timestamp": start + i * 60,
+            "type": "chat",
+            "author": "" if from_me else rng.choice(participants),
+        })
+    return messages
@@ -6,8 +6,20 @@ ENHANCED VERSION - Smart Sync, larger conversation text, complete functionality
 
 import pygame
 import requests
+import sys
 import time
 import threading
+import asyncio
+import functools
+import bisect
+import codecs
+import itertools
+import json
+import re
+import unicodedata
+import sqlite3
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Constants (inline to avoid config dependency)
 BACKGROUND_COLOR = (23, 23, 23)
@@ -19,25 +31,1656 @@ SUCCESS_COLOR = (34, 139, 34)
 HIGHLIGHT_COLOR = (100, 200, 100)
 WARNING_COLOR = (255, 255, 0)
 
+class BackendClient:
+    """Shared keep-alive HTTP client for every backend call
+
+    One requests.Session with a small connection pool replaces the bare
+    requests.get/post calls, so polls and sends reuse an open TCP connection.
+    Each endpoint has its own timeout and retry/backoff policy and keeps
+    latency and error counters.
+    """
+
+    # endpoint -> (connect timeout, read timeout), retries (idempotent requests only)
+    POLICIES = {
+        "status": {"timeout": (3, 5), "retries": 1},
+        "capabilities": {"timeout": (3, 5), "retries": 0},
+        "contacts": {"timeout": (3, 15), "retries": 1},
+        "chats": {"timeout": (3, 15), "retries": 1},
+        "chat": {"timeout": (3, 15), "retries": 1},
+        "messages": {"timeout": (3, 15), "retries": 1},
+        "history": {"timeout": (3, 10), "retries": 0},
+        "send": {"timeout": (3, 15), "retries": 0},
+        "reset": {"timeout": (3, 10), "retries": 0},
+        "events": {"timeout": (5, 60), "retries": 0},
+    }
+    DEFAULT_POLICY = {"timeout": (3, 10), "retries": 0}
+    RETRY_STATUS = (502, 503, 504)
+    BACKOFF = 0.25  # seconds, doubled on every retry
+
+    def __init__(self, base_url, pool_size=8):
+        from requests.adapters import HTTPAdapter
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self.last_latency_ms = None
+        self.on_latency = None  # optional callback(endpoint, elapsed_ms), e.g. the frame profiler
+        self._capabilities = None  # GET /capabilities manifest, dropped when the connection is lost
+
+    def get(self, endpoint, path, **kwargs):
+        return self.request("GET", endpoint, path, **kwargs)
+
+    def post(self, endpoint, path, **kwargs):
+        return self.request("POST", endpoint, path, **kwargs)
+
+    def delete(self, endpoint, path, **kwargs):
+        return self.request("DELETE", endpoint, path, **kwargs)
+
+    def request(self, method, endpoint, path, timeout=None, retries=None, **kwargs):
+        """Send a request using the endpoint's policy; raises requests exceptions like requests.get"""
+        policy = self.POLICIES.get(endpoint, self.DEFAULT_POLICY)
+        timeout = timeout if timeout is not None else policy["timeout"]
+        if retries is None:
+            retries = policy["retries"] if method == "GET" else 0
+
+        attempt = 0
+        while True:
+            started = time.time()
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(endpoint, started, error=True)
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    # The backend may come back as a different build - ask for its manifest again
+                    self._capabilities = None
+                if attempt >= retries:
+                    raise
+            else:
+                failed = response.status_code >= 500
+                self._record(endpoint, started, error=failed)
+                if response.status_code not in self.RETRY_STATUS or attempt >= retries:
+                    return response
+                response.close()
+            time.sleep(self.BACKOFF * (2 ** attempt))
+            attempt += 1
+            self._count(endpoint, "retries")
+
+    def capabilities(self):
+        """Endpoint manifest from GET /capabilities, fetched once per connection
+
+        Backends that predate the manifest get {} (cached too), so callers fall
+        back to probing. Connection errors are not cached.
+        """
+        if self._capabilities is None:
+            try:
+                response = self.get("capabilities", "/capabilities")
+                manifest = response.json() if response.status_code == 200 else {}
+                self._capabilities = manifest if isinstance(manifest, dict) else {}
+            except requests.exceptions.RequestException:
+                return {}
+            except ValueError:
+                self._capabilities = {}
+        return self._capabilities
+
+    def supports(self, endpoint):
+        return endpoint in self.capabilities().get("endpoints", {})
+
+    def _record(self, endpoint, started, error=False):
+        elapsed_ms = (time.time() - started) * 1000
+        self.last_latency_ms = elapsed_ms
+        if self.on_latency:
+            self.on_latency(endpoint, elapsed_ms)
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["last_ms"] = elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if error:
+                stats["errors"] += 1
+
+    def _count(self, endpoint, counter):
+        with self._stats_lock:
+            self._stats[endpoint][counter] += 1
+
+    def stats(self):
+        """Per-endpoint call/error/retry counts and latencies (ms)"""
+        with self._stats_lock:
+            return {
+                endpoint: dict(values, avg_ms=round(values["total_ms"] / values["calls"], 1) if values["calls"] else 0.0)
+                for endpoint, values in self._stats.items()
+            }
+
+    def close(self):
+        self.session.close()
+
+
+# Result of a network job, applied by the main loop: attribute changes and/or a callable
+UIUpdate = namedtuple("UIUpdate", "key generation changes action")
+
+
+class NetworkJob:
+    """Handle given to a worker job: posts UI updates and tells whether a newer job replaced it"""
+    __slots__ = ("worker", "key", "generation")
+
+    def __init__(self, worker, key, generation):
+        self.worker = worker
+        self.key = key
+        self.generation = generation
+
+    @property
+    def stale(self):
+        return self.worker.is_stale(self.key, self.generation)
+
+    def set(self, **changes):
+        """Queue attribute changes on the WhatsApp instance"""
+        self.worker.post_update(UIUpdate(self.key, self.generation, tuple(changes.items()), None))
+
+    def call(self, action, *args):
+        """Queue a call to run on the main thread"""
+        if args:
+            action = functools.partial(action, *args)
+        self.worker.post_update(UIUpdate(self.key, self.generation, (), action))
+
+
+class NetworkWorker:
+    """Single asyncio loop thread that owns all backend I/O
+
+    Jobs are keyed: submitting a job with the same key as a pending one cancels
+    it, and anything the old job still posts is dropped as stale (loading chat A
+    after the user already opened chat B). Blocking requests calls run on a
+    small executor; results come back as immutable UIUpdate records that the
+    main loop applies once per frame with drain(), so draw() never sees state
+    changing under it.
+    """
+
+    def __init__(self, max_blocking=4, wake=None):
+        self.wake = wake
+        self._updates = deque()
+        self._wake_pending = threading.Event()  # a wake was sent and drain() has not run since
+        self._lock = threading.Lock()
+        self._generations = {}  # key -> generation of the newest job
+        self._futures = {}  # key -> concurrent future of the pending job
+        self._counter = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_blocking, thread_name_prefix="network")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="network-worker", daemon=True)
+        self._thread.start()
+        self.counters = {"submitted": 0, "cancelled": 0, "failed": 0, "applied": 0, "dropped": 0}
+
+    def is_stale(self, key, generation):
+        return key is not None and self._generations.get(key) != generation
+
+    def submit(self, key, fn, *args, delay=0, replace=True):
+        """Run fn(job, *args) off the main thread; returns False if not submitted
+
+        key=None jobs are never cancelled. With replace=False a pending job with
+        the same key is left alone and this one is skipped.
+        """
+        with self._lock:
+            if key is not None:
+                pending = self._futures.get(key)
+                if pending is not None and not pending.done():
+                    if not replace:
+                        return False
+                    pending.cancel()
+                    self.counters["cancelled"] += 1
+            generation = next(self._counter)
+            job = NetworkJob(self, key, generation)
+            if key is not None:
+                self._generations[key] = generation
+            self.counters["submitted"] += 1
+            future = asyncio.run_coroutine_threadsafe(self._run(job, fn, args, delay), self._loop)
+            if key is not None:
+                self._futures[key] = future
+        return True
+
+    def cancel(self, key):
+        """Cancel the pending job with this key and drop anything it still posts"""
+        with self._lock:
+            self._generations[key] = next(self._counter)
+            pending = self._futures.pop(key, None)
+            if pending is not None and not pending.done():
+                pending.cancel()
+                self.counters["cancelled"] += 1
+
+    def call_later(self, delay, action):
+        """Run action on the main thread after delay seconds"""
+        self.submit(None, lambda job: job.call(action), delay=delay)
+
+    async def _run(self, job, fn, args, delay):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            if job.stale:
+                return
+            await self._loop.run_in_executor(self._executor, functools.partial(fn, job, *args))
+        except asyncio.CancelledError:
+            pass  # The executor call (if started) finishes on its own; its updates are stale
+        except Exception as e:
+            self.counters["failed"] += 1
+            print(f"DEBUG: Network job {job.key} failed: {e}")
+
+    def post_update(self, update):
+        self._updates.append(update)
+        if self.wake and not self._wake_pending.is_set():
+            self._wake_pending.set()
+            self.wake()
+
+    def post(self, action):
+        """Queue a main-thread call from any thread (e.g. the event stream reader)"""
+        self.post_update(UIUpdate(None, None, (), action))
+
+    def drain(self):
+        """Pending updates whose job is still current, oldest first (main thread)"""
+        # Cleared first: anything posted from here on sends a new wake
+        self._wake_pending.clear()
+        updates = []
+        while self._updates:
+            update = self._updates.popleft()
+            if self.is_stale(update.key, update.generation):
+                self.counters["dropped"] += 1
+                continue
+            updates.append(update)
+        self.counters["applied"] += len(updates)
+        return updates
+
+    def stats(self):
+        return dict(self.counters, pending=sum(1 for future in self._futures.values() if not future.done()))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown(wait=False)
+
+
+class SyncCoordinator:
+    """At most one sync in flight; callers that ask while it runs join it
+
+    Startup, the welcome key, the auto-sync on the main menu and the R key can
+    all ask for a sync within a second of each other. The first request starts
+    it on the network worker; the rest are counted as joined and just watch its
+    progress. fetch_all() runs the independent requests of a sync concurrently.
+    """
+
+    def __init__(self, worker, max_parallel=3):
+        self.worker = worker
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="sync")
+        self._lock = threading.Lock()
+        self._in_flight = False
+        self.counters = {"started": 0, "joined": 0}
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def request(self, sync_fn):
+        """Run sync_fn(job) on the worker unless a sync is running; True if this call started it"""
+        with self._lock:
+            if self._in_flight:
+                self.counters["joined"] += 1
+                return False
+            self._in_flight = True
+            self.counters["started"] += 1
+        # Unkeyed: _in_flight is the only guard. A keyed replace=False submit could be
+        # refused while the previous sync's future is still finishing on the loop thread,
+        # leaving _in_flight set with nothing left to clear it.
+        self.worker.submit(None, self._run, sync_fn)
+        return True
+
+    def _run(self, job, sync_fn):
+        try:
+            sync_fn(job)
+        finally:
+            with self._lock:
+                self._in_flight = False
+
+    def fetch_all(self, **calls):
+        """Start every blocking call at once - {name: future}, one round trip instead of one per call"""
+        return {name: self._executor.submit(call) for name, call in calls.items()}
+
+    def stats(self):
+        return dict(self.counters, in_flight=self._in_flight)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def serialized_message_id(message):
+    """Serialized message id (backend ids may arrive as {'_serialized': ...} objects) or None"""
+    message_id = message.get("id")
+    if isinstance(message_id, dict):
+        message_id = message_id.get("_serialized")
+    return str(message_id) if message_id else None
+
+
+def message_timestamp(message):
+    try:
+        return int(message.get("timestamp") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def intern_text(value):
+    """Interned str (None -> ""): ids, names and types repeat across thousands of records"""
+    if value is None:
+        return ""
+    return sys.intern(value if isinstance(value, str) else str(value))
+
+
+class Record:
+    """Compact __slots__ stand-in for a backend JSON dict
+
+    Subclasses build instances with a from_dict(data) classmethod and
+    FIELDS maps the backend's JSON keys to attributes. Draw and input code
+    reads the attributes; get() and [] keep dict-style access working for
+    generic code (delta merge, debug prints) and to_dict() is what the local
+    store writes. Repeated strings are interned, so a contact id, the chat
+    with that contact and every group message it wrote share one string.
+    """
+    __slots__ = ()
+    FIELDS = {}
+
+    @classmethod
+    def from_list(cls, items):
+        return [item if isinstance(item, cls) else cls.from_dict(item) for item in items]
+
+    def get(self, key, default=None):
+        attribute = self.FIELDS.get(key)
+        value = getattr(self, attribute) if attribute else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        attribute = self.FIELDS.get(key)
+        if attribute is None:
+            raise KeyError(key)
+        return getattr(self, attribute)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def to_dict(self):
+        values = ((key, getattr(self, attribute)) for key, attribute in self.FIELDS.items())
+        return {key: value for key, value in values if value is not None}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Message(Record):
+    """One text message of a conversation"""
+    __slots__ = ("id", "body", "from_me", "timestamp", "type", "author", "participant")
+    FIELDS = {"id": "id", "body": "body", "fromMe": "from_me", "timestamp": "timestamp",
+              "type": "type", "author": "author", "participant": "participant"}
+
+    def __init__(self, id, body, from_me=False, timestamp=0, type="chat", author="", participant=""):
+        self.id = id
+        self.body = body
+        self.from_me = from_me
+        self.timestamp = timestamp
+        self.type = type
+        self.author = author
+        self.participant = participant
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        timestamp = message_timestamp(data) if data.get("timestamp") is not None else int(time.time())
+        return cls(serialized_message_id(data) or str(time.time()), data.get("body") or "",
+                   bool(data.get("fromMe", False)), timestamp, intern_text(data.get("type") or "chat"),
+                   intern_text(data.get("author")), intern_text(data.get("participant")))
+
+
+class Contact(Record):
+    """Address book entry - only what search and the new chat screen need"""
+    __slots__ = ("id", "name", "phone", "pushname")
+    FIELDS = {"id": "id", "name": "name", "phone": "phone", "pushname": "pushname"}
+
+    def __init__(self, id, name, phone="", pushname=""):
+        self.id = id
+        self.name = name
+        self.phone = phone
+        self.pushname = pushname
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        name = intern_text((data.get("name") or "").strip())
+        return cls(intern_text(data.get("id")), name, data.get("phone") or "",
+                   intern_text(data.get("pushname") or name))
+
+
+class Chat(Record):
+    """Chat list entry; the nested lastMessage object is flattened into three slots"""
+    __slots__ = ("id", "name", "is_group", "unread_count", "last_body", "last_timestamp", "last_from")
+    FIELDS = {"id": "id", "name": "name", "isGroup": "is_group", "unreadCount": "unread_count",
+              "lastMessage": "last_message"}
+
+    def __init__(self, id, name, is_group=False, unread_count=0, last_body=None, last_timestamp=0, last_from=None):
+        self.id = id
+        self.name = name
+        self.is_group = is_group
+        self.unread_count = unread_count
+        self.last_body = last_body
+        self.last_timestamp = last_timestamp
+        self.last_from = last_from
+
+    @property
+    def last_message(self):
+        if self.last_body is None and not self.last_timestamp:
+            return None
+        return {"body": self.last_body, "timestamp": self.last_timestamp, "from": self.last_from}
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        last = data.get("lastMessage") or {}
+        return cls(intern_text(data.get("id")), intern_text(data.get("name")), bool(data.get("isGroup", False)),
+                   int(data.get("unreadCount") or 0), last.get("body"), message_timestamp(last),
+                   intern_text(last.get("from")) if last.get("from") else None)
+
+
+def merge_delta(items, changed, removed, sort_key=None):
+    """Apply a /chats or /contacts delta (changed entries + removed ids) to a cached list"""
+    dropped = set(removed)
+    dropped.update(entry.get("id") for entry in changed)
+    merged = [item for item in items if item.get("id") not in dropped]
+    merged.extend(changed)
+    if sort_key:
+        merged.sort(key=sort_key)
+    return merged
+
+
+def valid_contact(contact):
+    """Contacts worth listing: named (not the backend's "Unknown" placeholder) and with an id"""
+    return bool(contact.id and contact.name and contact.name != "Unknown")
+
+
+class StreamedList:
+    """Incremental reader for the {"<kind>": [...], ...} bodies of /contacts and /chats
+
+    Iterating reads a stream=True response one chunk at a time and yields each
+    entry of the kind array as soon as it is complete; every other top-level
+    key ends up in meta (complete once the iteration is). Only the undecoded
+    tail of the current chunk is buffered, so memory follows the chunk size
+    instead of the account size. on_progress(fraction, count) is called per
+    chunk; fraction is None when the response has no Content-Length.
+    """
+    CHUNK_SIZE = 64 * 1024
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r"\s*")
+    _number_tail = frozenset("0123456789.eE+-")  # a number followed by one of these was cut short
+
+    def __init__(self, response, kind, on_progress=None):
+        self.kind = kind
+        self.meta = {}
+        self.count = 0
+        self.on_progress = on_progress
+        self._size = int(response.headers.get("Content-Length") or 0)
+        self._received = 0
+        self._chunks = response.iter_content(self.CHUNK_SIZE)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        self._expect("{")
+        while self._peek() != "}":
+            if self._buffer[self._pos] == ",":
+                self._pos += 1
+                continue
+            key = self._value()
+            self._expect(":")
+            if key == self.kind and self._peek() == "[":
+                self._pos += 1
+                while self._peek() != "]":
+                    if self._buffer[self._pos] == ",":
+                        self._pos += 1
+                        continue
+                    entry = self._value()
+                    self.count += 1
+                    yield entry
+                self._pos += 1
+            else:
+                self.meta[key] = self._value()
+
+    def _fill(self):
+        """Append the next chunk to the (compacted) buffer - False once the body is exhausted"""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            self._received += len(chunk)
+            text = self._utf8.decode(chunk)
+            if self.on_progress:
+                self.on_progress(min(1.0, self._received / self._size) if self._size else None, self.count)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return not self._eof or bool(text)
+
+    def _peek(self):
+        """Next non-whitespace character, reading more of the body if needed"""
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError(f"Truncated /{self.kind} response")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Unexpected {self._buffer[self._pos]!r} in /{self.kind} response")
+        self._pos += 1
+
+    def _value(self):
+        """Decode one JSON value, reading more of the body while it may be cut short
+
+        raw_decode stops a number wherever the chunk ends ("1." decodes as 1),
+        so a number is only accepted once something other than a number
+        character follows it.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                complete = end < len(self._buffer) and not (
+                    isinstance(value, (int, float)) and self._buffer[end] in self._number_tail)
+                if complete or self._eof:
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+def chat_page_key(chat):
+    """(last activity desc, id asc) - the order /chats pages are served in"""
+    return (-chat.last_timestamp, chat.id)
+
+
+def contact_name_key(contact):
+    return contact.name.lower()
+
+
+class ChatListWindow:
+    """Chat list fetched from /chats one cursor page at a time, newest activity first
+
+    Behaves like the plain list it replaces (len/iter/index over the chats
+    loaded so far); ``total`` is the server-side count. Keyset cursors only
+    move forward, so the loaded prefix grows as the selection approaches its
+    end, always keeping one page of prefetch ahead of the selection.
+    Mutated on the main thread only; pages are fetched by the network worker.
+    on_page is called after a scrolled-to page is appended (e.g. to cache it).
+    """
+
+    def __init__(self, backend=None, page_size=20, on_change=None, worker=None, on_page=None):
+        self.backend = backend
+        self.page_size = page_size
+        self.on_change = on_change
+        self.on_page = on_page
+        self.worker = worker
+        self.total = 0
+        self.next_cursor = None
+        self._items = []
+        self._boundary = None  # sort key of the last fetched row; later rows belong to unfetched pages
+        self._loading = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    @property
+    def complete(self):
+        return self.next_cursor is None
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def reset(self, chats, next_cursor=None, total=None):
+        """Replace the loaded chats (first page, cache or a full unpaginated list)"""
+        chats = [chat for chat in Chat.from_list(chats) if chat.id]
+        self._items = chats
+        self.next_cursor = next_cursor
+        self.total = total if total is not None else len(chats)
+        self._boundary = chat_page_key(chats[-1]) if chats and next_cursor else None
+        self._changed()
+
+    def apply_delta(self, changed, removed, total=None):
+        """Merge a /chats?since= delta into the loaded prefix, keeping page order"""
+        items = merge_delta(self._items, Chat.from_list(changed), removed, chat_page_key)
+        if self._boundary is not None:
+            # Chats that now sort past the loaded prefix will arrive with their page
+            items = [chat for chat in items if chat_page_key(chat) <= self._boundary]
+        self._items = items
+        if total is not None:
+            self.total = total
+        self._changed()
+
+    def fetch_page(self, cursor):
+        """GET the page after cursor (blocking); returns the response data or None"""
+        response = self.backend.get("chats", "/chats", params={"limit": self.page_size, "cursor": cursor})
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return data if data.get("success", False) else None
+
+    def apply_page(self, cursor, data):
+        """Append a fetched page. Returns False if it no longer follows the loaded prefix"""
+        self._loading = False
+        if not data or cursor != self.next_cursor:
+            return False  # failed, or the list was reset meanwhile
+        known = {chat.id for chat in self._items}
+        page = [chat for chat in Chat.from_list(data.get("chats", [])) if chat.id and chat.id not in known]
+        self._items = self._items + page
+        self.next_cursor = data.get("nextCursor")
+        self.total = data.get("total", self.total)
+        self._boundary = chat_page_key(self._items[-1]) if self._items and self.next_cursor else None
+        self._changed()
+        if self.on_page:
+            self.on_page()
+        return True
+
+    def ensure_loaded(self, index):
+        """Prefetch the next page once index gets within a page of the end"""
+        if (not self.worker or self.complete or self._loading
+                or index < len(self._items) - self.page_size):
+            return
+
+        def fetch(job, cursor):
+            data = None
+            try:
+                data = self.fetch_page(cursor)
+            except Exception as e:
+                print(f"DEBUG: Chat page prefetch failed: {e}")
+            job.call(self.apply_page, cursor, data)
+
+        self._loading = True
+        self.worker.submit("chat_page", fetch, self.next_cursor)
+
+    def state(self):
+        return {"next_cursor": self.next_cursor, "total": self.total}
+
+
+class ChatPrefetcher:
+    """Warms the messages of the chats the user is likely to open next
+
+    Main-thread owned. warm() runs whenever the chat list selection moves: the
+    selected chat, its neighbours and the top unread chats are queued, at most
+    max_parallel fetches run on the network worker at once, and fetches for
+    chats that left that set are cancelled (during the short start delay that
+    means the request is never sent). Results go to a small LRU that
+    load_chat_messages takes from when a chat is opened.
+    """
+    NEIGHBORS = (0, 1, -1)  # offsets from the selection, most likely first
+    TOP_UNREAD = 3
+    START_DELAY = 0.15  # seconds the selection must rest before a fetch is sent
+    MAX_AGE = 60  # seconds a prefetched page stays good enough to open without a refresh
+
+    def __init__(self, fetch, worker=None, max_entries=12, max_parallel=2):
+        self.fetch = fetch  # fetch(chat) -> (messages, has_more) or None, runs on the worker
+        self.worker = worker
+        self.max_entries = max_entries
+        self.max_parallel = max_parallel
+        self._cache = OrderedDict()  # chat id -> (messages, has_more, fetched at)
+        self._queue = []  # chats waiting for a free slot, most wanted first
+        self._running = {}  # chat id -> worker job key
+        self.counters = {"hits": 0, "misses": 0, "fetched": 0, "cancelled": 0, "failed": 0, "evicted": 0}
+
+    def candidates(self, chats, index):
+        """Chats worth warming for a selection: neighbours first, then the most unread"""
+        picked = [chats[index + offset] for offset in self.NEIGHBORS if 0 <= index + offset < len(chats)]
+        unread = [chat for chat in chats if chat.unread_count]
+        unread.sort(key=lambda chat: chat.unread_count, reverse=True)
+        picked.extend(unread[:self.TOP_UNREAD])
+
+        seen = set()
+        return [chat for chat in picked if chat.id and chat.id not in seen and not seen.add(chat.id)]
+
+    def warm(self, chats, index):
+        if not self.worker:
+            return
+        wanted = [chat for chat in self.candidates(chats, index) if not self._fresh(chat.id)]
+        wanted_ids = {chat.id for chat in wanted}
+        for chat_id in [chat_id for chat_id in self._running if chat_id not in wanted_ids]:
+            self.worker.cancel(self._running.pop(chat_id))
+            self.counters["cancelled"] += 1
+        self._queue = [chat for chat in wanted if chat.id not in self._running]
+        self._start_next()
+
+    def _start_next(self):
+        while self._queue and len(self._running) < self.max_parallel:
+            chat = self._queue.pop(0)
+            key = f"prefetch:{chat.id}"
+            self._running[chat.id] = key
+            self.worker.submit(key, self._fetch_job, chat, delay=self.START_DELAY)
+
+    def _fetch_job(self, job, chat):
+        result = None
+        try:
+            result = self.fetch(chat)
+        except Exception as e:
+            print(f"DEBUG: Prefetch of {chat.id} failed: {e}")
+        job.call(self._finish, chat.id, result)
+
+    def _finish(self, chat_id, result):
+        self._running.pop(chat_id, None)
+        if result is None:
+            self.counters["failed"] += 1
+        else:
+            messages, has_more = result
+            self._cache[chat_id] = (messages, has_more, time.time())
+            self._cache.move_to_end(chat_id)
+            self.counters["fetched"] += 1
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.counters["evicted"] += 1
+        self._start_next()
+
+    def _fresh(self, chat_id):
+        entry = self._cache.get(chat_id)
+        return entry is not None and time.time() - entry[2] <= self.MAX_AGE
+
+    def take(self, chat_id):
+        """(messages, has_more) prefetched for chat_id, or None - counted as a hit or a miss"""
+        fresh = self._fresh(chat_id)
+        entry = self._cache.pop(chat_id, None)
+        if not fresh:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return entry[0], entry[1]
+
+    def invalidate(self, chat_id):
+        """Drop a prefetched page that is now out of date (a new message arrived)"""
+        self._cache.pop(chat_id, None)
+
+    def stats(self):
+        opened = self.counters["hits"] + self.counters["misses"]
+        return dict(self.counters, entries=len(self._cache), running=len(self._running),
+                    hit_rate=round(self.counters["hits"] / opened, 3) if opened else 0.0)
+
+
+# Open conversation memory cap; scrollback paging stops once it is reached
+MAX_CONVERSATION_MESSAGES = 1000
+HISTORY_PAGE_SIZE = 30
+HISTORY_PREFETCH_LINES = 10  # start fetching older messages this many lines before the top
+
+
+class ConversationStore:
+    """Messages of the open conversation: bounded ring buffer plus an id index
+
+    Appends are O(1) and dedupe is a dict lookup; a message older than the
+    newest one is inserted at its timestamp position (scanning back from the
+    end, where late arrivals land). When full, the oldest message falls off.
+    Supports len(), iteration, indexing and slicing like the list it replaces.
+    Holds Message records; plain dicts are converted on the way in.
+    """
+
+    def __init__(self, messages=(), max_messages=MAX_CONVERSATION_MESSAGES):
+        self.max_messages = max_messages
+        self._messages = deque(maxlen=max_messages)
+        self._by_id = {}  # message id -> message
+        for message in messages:
+            self.add(message)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __bool__(self):
+        return bool(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._messages))
+            if step != 1:
+                return list(self._messages)[index]
+            return list(itertools.islice(self._messages, start, max(start, stop)))
+        return self._messages[index]
+
+    def __contains__(self, message_id):
+        return message_id in self._by_id
+
+    def add(self, message):
+        """Insert a message in timestamp order; returns False if it is already stored"""
+        message = Message.from_dict(message)
+        message_id = message.id
+        if message_id in self._by_id:
+            return False
+
+        messages = self._messages
+        timestamp = message.timestamp
+        if not messages or timestamp >= messages[-1].timestamp:
+            if len(messages) == self.max_messages:
+                self._forget(messages[0])
+            messages.append(message)
+        else:
+            position = len(messages)
+            while position > 0 and messages[position - 1].timestamp > timestamp:
+                position -= 1
+            if len(messages) == self.max_messages:
+                if position == 0:
+                    return False  # Older than everything we keep
+                self._forget(messages.popleft())
+                position -= 1
+            messages.insert(position, message)
+
+        self._by_id[message_id] = message
+        return True
+
+    @property
+    def room(self):
+        return self.max_messages - len(self._messages)
+
+    def prepend(self, older):
+        """Add a page of older messages (oldest first) in front; returns how many were added
+
+        Never evicts: once the store is full, older history is simply not kept.
+        """
+        added = 0
+        messages = self._messages
+        for message in reversed(older):
+            if not self.room:
+                break
+            message = Message.from_dict(message)
+            if message.id in self._by_id:
+                continue
+            if messages and message.timestamp > messages[0].timestamp:
+                added += self.add(message)
+                continue
+            messages.appendleft(message)
+            self._by_id[message.id] = message
+            added += 1
+        return added
+
+    def _forget(self, message):
+        self._by_id.pop(message.id, None)
+
+    def clear(self):
+        self._messages.clear()
+        self._by_id.clear()
+
+
+class LocalStore:
+    """On-device SQLite cache (WAL mode) of chats, contacts and recent messages per chat
+
+    Lets the chat list and chat view render from disk immediately, before (or
+    without) the backend answering. All methods swallow database errors and
+    return empty results - the cache must never take the UI down.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chats (id TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS contacts (id TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS messages (
+            chat_id TEXT NOT NULL, id TEXT NOT NULL, timestamp INTEGER NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (chat_id, id)
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_chat ON messages (chat_id, timestamp);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path, messages_per_chat=200):
+        self.path = path
+        self.messages_per_chat = messages_per_chat
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def _read(self, sql, params=()):
+        try:
+            with self._lock:
+                return self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"DEBUG: Local store read error: {e}")
+            return []
+
+    def _write(self, statements):
+        try:
+            with self._lock, self._conn:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self._conn.executemany(sql, params)
+                    else:
+                        self._conn.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"DEBUG: Local store write error: {e}")
+
+    def _load_list(self, table, record):
+        return [record.from_dict(json.loads(data)) for (data,) in self._read(f"SELECT data FROM {table} ORDER BY position")]
+
+    def _save_list(self, table, items):
+        rows = [(item.id, position, json.dumps(item.to_dict())) for position, item in enumerate(items) if item.id]
+        self._write([(f"DELETE FROM {table}", ()),
+                     (f"INSERT OR REPLACE INTO {table} (id, position, data) VALUES (?, ?, ?)", rows)])
+
+    def load_chats(self):
+        return self._load_list("chats", Chat)
+
+    def save_chats(self, chats):
+        self._save_list("chats", chats)
+
+    def load_contacts(self):
+        return self._load_list("contacts", Contact)
+
+    def save_contacts(self, contacts):
+        self._save_list("contacts", contacts)
+
+    def load_messages(self, chat_id, limit=100):
+        """Most recent cached messages of a chat, oldest first"""
+        rows = self._read("SELECT data FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?", (chat_id, limit))
+        return [Message.from_dict(json.loads(data)) for (data,) in reversed(rows)]
+
+    def save_messages(self, chat_id, messages):
+        """Upsert messages of a chat, keeping only the newest messages_per_chat"""
+        rows = []
+        for message in messages:
+            if message.id:
+                rows.append((chat_id, message.id, message.timestamp, json.dumps(message.to_dict())))
+        if not rows:
+            return
+        self._write([
+            ("INSERT OR REPLACE INTO messages (chat_id, id, timestamp, data) VALUES (?, ?, ?, ?)", rows),
+            ("DELETE FROM messages WHERE chat_id = ? AND id NOT IN "
+             "(SELECT id FROM messages WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?)",
+             (chat_id, chat_id, self.messages_per_chat)),
+        ])
+
+    def get_meta(self, key, default=None):
+        rows = self._read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_meta(self, key, value):
+        self._write([("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))])
+
+    def clear(self):
+        self._write([("DELETE FROM chats", ()), ("DELETE FROM contacts", ()),
+                     ("DELETE FROM messages", ()), ("DELETE FROM meta", ())])
+
+
+class ContactSearchIndex:
+    """Substring search over contact names with keystroke narrowing
+
+    Names are normalized once (casefold, accents removed) and indexed by
+    trigram (plus single characters for 1-2 letter queries). Typing another
+    character filters the previous result set instead of rescanning all
+    contacts, and every query result is remembered so Backspace is a lookup.
+    """
+
+    def __init__(self, contacts=(), max_history=256):
+        self.max_history = max_history
+        self.contacts = Contact.from_list(contacts)
+        self._keys = [self.normalize(contact.name) for contact in self.contacts]
+        self._grams = {}
+        self._chars = {}
+        for index, key in enumerate(self._keys):
+            for char in set(key):
+                self._chars.setdefault(char, []).append(index)
+            for gram in set(key[i:i + 3] for i in range(len(key) - 2)):
+                self._grams.setdefault(gram, []).append(index)
+        self._history = {}  # normalized query -> matching indexes
+        self._last_query = ""
+        self._last_indexes = None
+
+    @staticmethod
+    def normalize(text):
+        decomposed = unicodedata.normalize("NFKD", str(text).casefold())
+        return "".join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+    def search(self, query):
+        """Return contacts whose name contains query, in address book order"""
+        query = self.normalize(query)
+        if not query:
+            return []
+
+        indexes = self._history.get(query)
+        if indexes is None:
+            keys = self._keys
+            if self._last_indexes is not None and self._last_query and self._last_query in query:
+                # Narrowing: anything matching the longer query matched the previous one
+                candidates = self._last_indexes
+            elif len(query) >= 3:
+                postings = [self._grams.get(query[i:i + 3], ()) for i in range(len(query) - 2)]
+                candidates = min(postings, key=len)
+            else:
+                candidates = min((self._chars.get(char, ()) for char in query), key=len)
+            indexes = [index for index in candidates if query in keys[index]]
+            if len(self._history) >= self.max_history:
+                self._history.clear()
+            self._history[query] = indexes
+
+        self._last_query = query
+        self._last_indexes = indexes
+        return [self.contacts[index] for index in indexes]
+
+
+class TextSanitizer:
+    """Precompiled replacement for the per-character filter_text_only loop
+
+    Media markers are matched with a single alternation regex, URLs with
+    precompiled patterns and emoji/symbol stripping with str.translate plus one
+    regex for characters outside the Basic Multilingual Plane. Results are
+    memoized by message id (each body is sanitized once per session) and, for
+    id-less strings, in a small LRU keyed by the text itself.
+    """
+
+    MEDIA_PATTERNS = [
+        "image omitted", "video omitted", "audio omitted", "document omitted",
+        "sticker omitted", "gif omitted", "location omitted", "contact omitted",
+        "[IMAGE]", "[VIDEO]", "[AUDIO]", "[DOCUMENT]", "[STICKER]", "[GIF]",
+        "[LOCATION]", "[CONTACT]", "📷", "🎥", "🎵", "📄", "📍"
+    ]
+    MEDIA_RE = re.compile("|".join(re.escape(pattern.lower()) for pattern in MEDIA_PATTERNS))
+    HTTP_RE = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    WWW_RE = re.compile(r'www\.(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    # Control characters (except newline, carriage return and tab), Misc Symbols and Dingbats
+    STRIP_TABLE = dict.fromkeys(
+        [code for code in range(32) if chr(code) not in "\n\r\t"] + list(range(0x2600, 0x27C0))
+    )
+    ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+    def __init__(self, max_text_entries=4096, max_message_entries=20000):
+        self.max_text_entries = max_text_entries
+        self.max_message_entries = max_message_entries
+        self._by_message = {}  # message id -> (raw text, sanitized text)
+        self._by_text = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sanitize(self, text, message_id=None):
+        if not text:
+            return ""
+        text = str(text)
+
+        with self._lock:
+            if message_id is not None:
+                entry = self._by_message.get(message_id)
+                if entry is not None and entry[0] == text:
+                    self.hits += 1
+                    return entry[1]
+            else:
+                result = self._by_text.get(text)
+                if result is not None:
+                    self._by_text.move_to_end(text)
+                    self.hits += 1
+                    return result
+            self.misses += 1
+
+        result = self._sanitize(text)
+
+        with self._lock:
+            if message_id is not None:
+                if len(self._by_message) >= self.max_message_entries:
+                    self._by_message.clear()
+                self._by_message[message_id] = (text, result)
+            else:
+                self._by_text[text] = result
+                if len(self._by_text) > self.max_text_entries:
+                    self._by_text.popitem(last=False)
+        return result
+
+    def _sanitize(self, text):
+        try:
+            # Remove common multimedia indicators
+            if self.MEDIA_RE.search(text.lower()):
+                return "[Media content]"
+
+            # Remove URLs
+            text = self.HTTP_RE.sub("[Link]", text)
+            text = self.WWW_RE.sub("[Link]", text)
+
+            # Filter out problematic Unicode characters (emojis, symbols)
+            text = self.ASTRAL_RE.sub("", text.translate(self.STRIP_TABLE))
+            filtered_text = text.strip()
+
+            # If the text is empty after filtering, provide a placeholder
+            if not filtered_text:
+                return "[Non-text content]"
+
+            # Limit length to prevent display issues
+            if len(filtered_text) > 200:
+                filtered_text = filtered_text[:197] + "..."
+
+            return filtered_text
+
+        except Exception as e:
+            print(f"Text filtering error: {e}")
+            return "[Filtered content]"
+
+
+TEXT_SANITIZER = TextSanitizer()
+
+
+class TextSurfaceCache:
+    """Bounded LRU of rendered text surfaces keyed by font, text, color and antialias flag
+
+    Eviction is by surface memory (width * height * bytes per pixel) so the cache
+    stays within a fixed budget on a Pi Zero regardless of string lengths.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._surfaces = OrderedDict()  # key -> (surface, size in bytes)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color, background=None):
+        if isinstance(font, CachedFont):
+            font = font.font
+        key = (font, text, bool(antialias), tuple(color), tuple(background) if background else None)
+        entry = self._surfaces.get(key)
+        if entry is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        if background is None:
+            surface = font.render(text, antialias, color)
+        else:
+            surface = font.render(text, antialias, color, background)
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        if size <= self.max_bytes:
+            self._surfaces[key] = (surface, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._surfaces.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._surfaces),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+TEXT_SURFACE_CACHE = TextSurfaceCache()
+
+
+class CachedFont:
+    """pygame Font wrapper whose render() goes through the shared text surface cache"""
+
+    def __init__(self, font, cache=TEXT_SURFACE_CACHE):
+        self.font = font
+        self.cache = cache
+
+    def render(self, text, antialias, color, background=None):
+        return self.cache.render(self.font, text, antialias, color, background)
+
+    def __getattr__(self, name):
+        # size(), get_height(), get_linesize()... go straight to the real font
+        return getattr(self.font, name)
+
+
 class MockOS:
     """Mock OS instance to replace lightberry OS dependencies"""
     def __init__(self):
         import os
         os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
-        self.font_s = pygame.font.Font(None, 20)
-        self.font_m = pygame.font.Font(None, 24)
-        self.font_l = pygame.font.Font(None, 28)
-        self.font_tiny = pygame.font.Font(None, 16)
+        self.font_s = CachedFont(pygame.font.Font(None, 20))
+        self.font_m = CachedFont(pygame.font.Font(None, 24))
+        self.font_l = CachedFont(pygame.font.Font(None, 28))
+        self.font_tiny = CachedFont(pygame.font.Font(None, 16))
+
+
+# Local cache database (override with WHATSAPP_CACHE_DB)
+CACHE_DB_PATH = os.environ.get("WHATSAPP_CACHE_DB", os.path.expanduser("~/.cache/whatsapp-beepy/whatsapp.db"))
+
+# Backend base URL (override with WHATSAPP_BACKEND_URL, e.g. to point at whatsapp_backend/mock_server.js)
+BACKEND_URL = os.environ.get("WHATSAPP_BACKEND_URL", "http://localhost:3333")
+
+# Attributes whose change is visible on screen - assigning any of them marks the frame dirty
+RENDER_STATE_ATTRS = frozenset([
+    "mode", "status_message", "error_message", "data_loaded", "connection_stable",
+    "chats", "contacts", "current_chat", "current_messages", "search_results",
+    "selected_chat_index", "selected_menu_index", "selected_contact_index",
+    "message_input", "search_input", "compose_mode", "message_scroll", "input_lines",
+    "sync_status", "sync_progress", "sync_complete", "splash_image", "background_image",
+    "history_loading",
+])
+
+
+class _ProfileSection:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FrameProfiler:
+    """Opt-in frame profiler: per-section timings, rolling percentiles, overlay and JSON report
+
+    Enabled with WHATSAPP_PROFILE=1 or toggled at runtime with F12. Sections
+    (draw_*, update, handle_event, net:<endpoint>) keep the last WINDOW
+    samples in ms; report() gives p50/p95/p99 and is dumped to report_path
+    every report_interval seconds by a timer (WhatsApp.schedule_profile_report),
+    so idle periods with no rendered frames are reported too. Disabled,
+    section() returns a shared no-op.
+    """
+
+    WINDOW = 300
+    OVERLAY_RECT = (236, 0, 164, 14)
+    _NULL = _NullSection()
+
+    def __init__(self, enabled=False, report_path=None, report_interval=30):
+        self.enabled = enabled
+        self.report_path = report_path
+        self.report_interval = report_interval
+        self._samples = {}  # section -> deque of ms
+        self._frame_times = deque(maxlen=self.WINDOW)  # perf_counter at each frame start
+        self._frame_started = None
+        self._lock = threading.Lock()
+        self.last_frame_ms = 0.0
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get("WHATSAPP_PROFILE_PATH",
+                              os.path.join(os.path.dirname(CACHE_DB_PATH), "profile.json"))
+        enabled = os.environ.get("WHATSAPP_PROFILE", "").lower() in ("1", "true", "yes", "on")
+        return cls(enabled=enabled, report_path=path)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        print(f"⏱️ Profiler {'enabled' if self.enabled else 'disabled'}")
+
+    def section(self, name):
+        return _ProfileSection(self, name) if self.enabled else self._NULL
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.WINDOW)
+            samples.append(ms)
+
+    def begin_frame(self):
+        if self.enabled:
+            self._frame_started = time.perf_counter()
+            self._frame_times.append(self._frame_started)
+
+    def end_frame(self):
+        if self.enabled and self._frame_started is not None:
+            self.last_frame_ms = (time.perf_counter() - self._frame_started) * 1000
+            self.record("frame", self.last_frame_ms)
+            self._frame_started = None
+
+    def fps(self):
+        times = self._frame_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        """Nearest-rank percentile of an already sorted list"""
+        rank = -(-fraction * len(ordered) // 1)  # ceil
+        index = max(0, min(len(ordered) - 1, int(rank) - 1))
+        return ordered[index]
+
+    def report(self):
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items() if samples}
+        sections = {
+            name: {
+                "count": len(ordered),
+                "p50": round(self.percentile(ordered, 0.50), 2),
+                "p95": round(self.percentile(ordered, 0.95), 2),
+                "p99": round(self.percentile(ordered, 0.99), 2),
+                "max": round(ordered[-1], 2),
+            }
+            for name, ordered in sorted(snapshot.items())
+        }
+        return {"timestamp": time.time(), "fps": round(self.fps(), 1), "window": self.WINDOW, "sections": sections}
+
+    def dump(self):
+        """Write report() as JSON (atomically replaced, so readers never see half a file)"""
+        if not self.report_path:
+            return
+        try:
+            directory = os.path.dirname(self.report_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.report_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(temp_path, self.report_path)
+        except OSError as e:
+            print(f"DEBUG: Profiler report not written: {e}")
+
+    def draw_overlay(self, screen, font, network_ms=None):
+        """FPS / frame ms / last network latency in the top-right corner; returns the rect drawn"""
+        rect = pygame.Rect(self.OVERLAY_RECT)
+        net = f"{network_ms:.0f}ms" if network_ms is not None else "--"
+        font = getattr(font, "font", font)  # bypass the text cache - this string changes every frame
+        text = font.render(f"{self.fps():4.1f}fps {self.last_frame_ms:5.1f}ms net {net}", True, (255, 255, 0))
+        pygame.draw.rect(screen, (0, 0, 0), rect)
+        screen.blit(text, (rect.x + 2, rect.y + 1))
+        return rect
+
+
+class RenderScheduler:
+    """Event-driven frame scheduler - only render when something changed or an animation is due"""
+    WAKE_EVENT = pygame.USEREVENT + 1
+    MAX_IDLE_WAIT_MS = 500
+
+    def __init__(self, max_fps=60):
+        self.max_fps = max_fps
+        self._dirty = threading.Event()
+        self._dirty.set()  # Always draw the first frame
+        self._next_tick = 0.0
+        self._main_thread = threading.current_thread()
+        self.started_at = time.time()
+        self.frames_rendered = 0
+
+    def invalidate(self):
+        """Mark the screen dirty; wakes up the main loop when called from a worker thread"""
+        if self._dirty.is_set():
+            return
+        self._dirty.set()
+        if threading.current_thread() is not self._main_thread:
+            self._post_wake()
+
+    def wake(self):
+        """Mark the screen dirty and always post WAKE_EVENT (network worker results)
+
+        Unlike invalidate(), a dirty flag that is already set is no guarantee:
+        the main loop may have drained the updates and be about to clear it in
+        begin_frame(), which would leave the new update queued until the idle
+        timeout. NetworkWorker only wakes once per drain, so this cannot flood.
+        """
+        self._dirty.set()
+        self._post_wake()
+
+    def _post_wake(self):
+        try:
+            if pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(self.WAKE_EVENT))
+        except Exception:
+            pass  # Event queue not available - next animation tick will pick it up
+
+    def frame_due(self, animation_interval=None):
+        """True if a frame must be rendered now"""
+        if self._dirty.is_set():
+            return True
+        return animation_interval is not None and time.time() >= self._next_tick
+
+    def wait_timeout(self, animation_interval=None):
+        """Milliseconds to block in pygame.event.wait
+
+        Idle waits are capped at MAX_IDLE_WAIT_MS: Python only runs signal
+        handlers (Ctrl+C) once the C-level wait returns.
+        """
+        if animation_interval is None:
+            return self.MAX_IDLE_WAIT_MS
+        return max(1, min(self.MAX_IDLE_WAIT_MS, int((self._next_tick - time.time()) * 1000)))
+
+    def begin_frame(self, animation_interval=None):
+        """Consume the dirty flag and schedule the next animation tick"""
+        self._dirty.clear()
+        self.frames_rendered += 1
+        if animation_interval is not None:
+            self._next_tick = time.time() + animation_interval
+
+    def stats(self):
+        """Frames rendered vs frames a fixed-rate loop would have drawn"""
+        elapsed = max(0.001, time.time() - self.started_at)
+        budget = int(elapsed * self.max_fps)
+        skipped = max(0, budget - self.frames_rendered)
+        return {
+            "elapsed": round(elapsed, 1),
+            "rendered": self.frames_rendered,
+            "skipped": skipped,
+            "skip_ratio": round(skipped / budget, 3) if budget else 0.0,
+        }
+
+
+class DamageTracker:
+    """Tracks which screen regions changed between frames for partial display updates
+
+    Each draw_* method declares its regions (header, rows, input box, status line)
+    together with a key describing what is drawn there. Only regions whose key or
+    rect changed are pushed to the display; a screen switch forces a full flip.
+    """
+
+    def __init__(self):
+        self._screen_key = None
+        self._previous = {}  # region name -> (rect, key)
+        self._current = {}
+        self._force_full = True
+
+    def begin_frame(self, screen_key):
+        if screen_key != self._screen_key:
+            self._screen_key = screen_key
+            self._force_full = True
+        self._current = {}
+
+    def region(self, name, rect, key):
+        self._current[name] = (pygame.Rect(rect), key)
+
+    def invalidate_all(self):
+        self._force_full = True
+
+    def end_frame(self):
+        """Return the rects to update, or None when the whole display must be flipped"""
+        current = self._current
+        previous = self._previous
+        self._previous = current
+
+        # Screens that declare no regions are always presented in full
+        if self._force_full or not current:
+            self._force_full = False
+            return None
+
+        rects = []
+        for name, (rect, key) in current.items():
+            old = previous.get(name)
+            if old is None or old[1] != key or old[0] != rect:
+                rects.append(rect)
+            if old is not None and old[0] != rect:
+                rects.append(old[0])  # Region moved or shrank - repaint where it was
+        for name, (rect, _) in previous.items():
+            if name not in current:
+                rects.append(rect)
+        return rects
+
+
+class MessageLayoutCache:
+    """Pre-wrapped chat message lines keyed by message id (for one text, width and font)
+
+    Wrapping measures every word, so only messages that are actually drawn get
+    wrapped. The rest of the conversation is laid out with heights estimated
+    from the text length and the font's average character width; settle()
+    swaps in the real height once a message is wrapped. message_scroll counts
+    from the newest message, so corrections above the view never move it.
+    """
+
+    def __init__(self, max_entries=2000, max_line_counts=20000):
+        self.max_entries = max_entries
+        self.max_line_counts = max_line_counts
+        self._entries = {}  # message key -> (text key, wrapped lines)
+        self._line_counts = {}  # message key -> (text key, line count); outlives evicted lines
+        self._char_widths = {}  # font id -> average character width
+        self._offsets_key = None
+        self._heights = []
+        self._offsets = [0]
+        self._dirty = False
+        self.generation = 0  # bumped whenever laid-out lines or heights change (damage key)
+
+    def clear(self):
+        self._entries.clear()
+        self._line_counts.clear()
+        self._offsets_key = None
+        self.generation += 1
+
+    def invalidate(self, message_key):
+        """Forget one message's layout (e.g. its author's display name changed)"""
+        dropped = self._entries.pop(message_key, None) is not None
+        if self._line_counts.pop(message_key, None) is not None:
+            self._offsets_key = None
+            dropped = True
+        if dropped:
+            self.generation += 1
+
+    def wrap(self, message_key, body, font, max_width, build_text):
+        """Return the wrapped lines for a message; build_text() is only called on a cache miss"""
+        text_key = (body, max_width, id(font))
+        entry = self._entries.get(message_key)
+        if entry is not None and entry[0] == text_key:
+            return entry[1]
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        if len(self._line_counts) >= self.max_line_counts:
+            self._line_counts.clear()
+        lines = self._wrap_text(build_text(), font, max_width)
+        self._entries[message_key] = (text_key, lines)
+        self._line_counts[message_key] = (text_key, len(lines))
+        return lines
+
+    def line_count(self, message_key, body, font, max_width):
+        """Wrapped line count if the message was wrapped before, else an estimate (no measuring)"""
+        counted = self._line_counts.get(message_key)
+        if counted is not None and counted[0] == (body, max_width, id(font)):
+            return counted[1]
+        char_width = self._char_widths.get(id(font))
+        if char_width is None:
+            sample = "the quick brown fox jumps over the lazy dog"
+            char_width = self._char_widths[id(font)] = font.size(sample)[0] / len(sample)
+        # + a short "Name: " prefix
+        return max(1, -(-int((len(body or "") + 8) * char_width) // max_width))
+
+    @staticmethod
+    def _wrap_text(text, font, max_width):
+        space_width = font.size(" ")[0]
+        lines = []
+        current_words = []
+        current_width = 0
+        for word in text.split():
+            word_width = font.size(word)[0]
+            if current_words and current_width + space_width + word_width > max_width:
+                lines.append(" ".join(current_words))
+                current_words = [word]
+                current_width = word_width
+            elif current_words:
+                current_words.append(word)
+                current_width += space_width + word_width
+            else:
+                current_words = [word]
+                current_width = word_width
+        if current_words:
+            lines.append(" ".join(current_words))
+        return lines
+
+    def offsets(self, signature, heights):
+        """Prefix sums of message heights (offsets[i] = top of message i)
+
+        heights() is only called when signature changes; settle() corrections
+        are folded in on the next call.
+        """
+        if signature != self._offsets_key:
+            self._heights = list(heights())
+            self._offsets_key = signature
+            self._dirty = True
+        if self._dirty:
+            self._offsets = [0]
+            self._offsets.extend(itertools.accumulate(self._heights))
+            self._dirty = False
+        return self._offsets
+
+    def settle(self, index, height):
+        """Record the real height of message index - True if the estimate was off"""
+        if self._heights[index] == height:
+            return False
+        self._heights[index] = height
+        self._dirty = True
+        self.generation += 1
+        return True
 
 
 class WhatsApp:
-    def __init__(self, os_instance=None):
+    def __init__(self, os_instance=None, start_background=True):
+        # Created first so every state assignment below can mark the frame dirty
+        self.render_scheduler = RenderScheduler()
+        self.damage = DamageTracker()
+        self.layout_cache = MessageLayoutCache()
+        # All backend I/O runs here; results are applied by the main loop once per frame
+        self.network = NetworkWorker(wake=self.render_scheduler.wake)
+        self.sync_coordinator = SyncCoordinator(self.network)
         if os_instance is None:
             self.os = MockOS()
         else:
             self.os = os_instance
-        self.backend_url = "http://localhost:3333"
+        self.backend_url = BACKEND_URL
+        self.backend = BackendClient(self.backend_url)
+        self.profiler = FrameProfiler.from_env()
+        self.backend.on_latency = lambda endpoint, ms: self.profiler.record(f"net:{endpoint}", ms)
+        # Delta sync cursors per list: {"contacts": {"version": ..., "etag": ...}, "chats": {...}}
+        self.sync_cursors = {}
+        self._saved_cursors = "{}"  # JSON last handed to the local store
+        self._saved_chats = []  # chat list last handed to the local store
+        self._save_chats_lock = threading.Lock()
         
         # Module state - added smart_sync mode
         self.mode = "splash"  # welcome -> loading -> main_menu -> chat_list/new_chat/smart_sync -> contact_search -> chat_view -> compose
@@ -45,10 +1688,18 @@ class WhatsApp:
         self.data_loaded = False
         
         # Chat data
-        self.chats = []
+        self.chats = ChatListWindow(self.backend, on_change=self.request_redraw, worker=self.network,
+                                    on_page=self.persist_chat_pages)
+        self.prefetcher = ChatPrefetcher(self.prefetch_chat_messages, worker=self.network)
         self.contacts = []  # Store all contacts for search
+        self.contact_index = ContactSearchIndex()
+        self.contact_names_by_id = {}  # contact id -> display name, rebuilt by set_contacts
+        self._participant_chat_id = None
+        self._participant_names = {}  # participant id -> resolved name for the open chat
         self.current_chat = None
-        self.current_messages = []
+        self.current_messages = ConversationStore()
+        self.history_loading = False  # older page of the open chat being fetched
+        self.history_exhausted = False
         
         # Navigation state
         self.selected_chat_index = 0
@@ -79,16 +1730,55 @@ class WhatsApp:
         self.splash_duration = 3.0  # Duración del splash en segundos
         self.splash_image = None
         self.background_image = None
+        self._background_composite = None  # background_image + dim overlay, display format
+        self._background_key = None
         
         # Load splash image
         self.load_splash_image()
         self.load_background_image()
 
+        # Cached chats/contacts from the last session - no network needed for the chat list
+        self.local_store = self.open_local_store()
+        self.load_cached_data()
+
         
-        # Start loading after welcome screen
-        self.schedule_loading()
-        # Start real-time updates
-        self.start_realtime_updates()
+        # start_background=False keeps the instance offline (benchmarks, tests)
+        if start_background:
+            # Start loading after welcome screen
+            self.schedule_loading()
+            # Start real-time updates
+            self.start_realtime_updates()
+            self.schedule_profile_report()
+
+    def schedule_profile_report(self):
+        """Dump the profiler report every report_interval seconds (on the worker), frames rendered or not"""
+        def report(job):
+            if self.profiler.enabled:
+                self.profiler.dump()
+            self.schedule_profile_report()
+
+        self.network.submit(None, report, delay=self.profiler.report_interval)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in RENDER_STATE_ATTRS:
+            scheduler = self.__dict__.get("render_scheduler")
+            if scheduler is not None:
+                scheduler.invalidate()
+
+    def request_redraw(self):
+        """Mark the screen dirty after in-place changes (list appends, etc.)"""
+        self.render_scheduler.invalidate()
+
+    def animation_interval(self):
+        """Seconds between animation frames for the current mode, None when the screen is static"""
+        if self.mode == "splash":
+            return 1.0 / 30  # Progress bar
+        if self.mode in ("welcome", "loading"):
+            return 0.25  # Loading dots + auto-transition timers
+        if self.mode == "contact_search" or (self.mode == "chat_view" and self.compose_mode):
+            return 0.5  # Blinking cursor
+        return None
 
     def load_splash_image(self):
         """Load the WhatsApp splash image"""
@@ -124,6 +1814,7 @@ class WhatsApp:
                     pygame.init()
                 self.background_image = pygame.image.load(image_path).convert()
                 self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height))
+                self.build_background_composite((self.screen_width, self.screen_height))
                 print("✅ Background image loaded successfully.")
             else:
                 print(f"❌ Background image not found: {image_path}")
@@ -132,303 +1823,562 @@ class WhatsApp:
             print(f"❌ Error loading background image: {e}")
             self.background_image = None
 
+    def open_local_store(self):
+        """Open the on-device cache, or None if the database cannot be used"""
+        try:
+            return LocalStore(CACHE_DB_PATH)
+        except Exception as e:
+            print(f"⚠️ Local cache disabled: {e}")
+            return None
+
+    def load_cached_data(self):
+        """Populate chats and contacts from the local cache"""
+        if not self.local_store:
+            return
+        chats = self.local_store.load_chats()
+        contacts = self.local_store.load_contacts()
+        if chats or contacts:
+            try:
+                self.sync_cursors = json.loads(self.local_store.get_meta("sync_cursors") or "{}")
+            except ValueError:
+                self.sync_cursors = {}
+            window = self.sync_cursors.get("chat_window") or {}
+            self.chats.reset(chats, window.get("next_cursor"), window.get("total"))
+            self.set_contacts(contacts)
+            self.data_loaded = True
+            self.status_message = f"Cached - {len(self.chats)} chats, {len(self.contacts)} contacts"
+            print(f"💾 Loaded {len(self.chats)} chats and {len(self.contacts)} contacts from local cache")
+
     def start_new_chat_with_contact(self, contact):
         """Start new chat with selected contact - check for existing conversation first"""
         if not contact:
             self.error_message = "No contact selected"
             return
         
-        contact_id = contact.get("id", "")
+        contact_id = contact.id
         
         # First, check if we already have a chat with this contact
         existing_chat = None
         for chat in self.chats:
-            if chat.get("id") == contact_id:
+            if chat.id == contact_id:
                 existing_chat = chat
                 break
         
         if existing_chat:
             # Load existing conversation
-            print(f"DEBUG: Found existing chat with {contact.get('name')}")
+            print(f"DEBUG: Found existing chat with {contact.name}")
             self.load_chat_messages(existing_chat)
         else:
             # Create a new chat object for the contact
-            new_chat = {
-                "id": contact_id,
-                "name": contact.get("name", "Unknown"),
-                "isGroup": False
-            }
-            print(f"DEBUG: Creating new chat with {contact.get('name')}")
+            new_chat = Chat(contact_id, contact.name or "Unknown")
+            print(f"DEBUG: Creating new chat with {contact.name}")
             self.load_chat_messages(new_chat)
     def schedule_loading(self):
         """Schedule data loading after welcome screen"""
+        def delayed_start():
+            if self.mode == "welcome":
+                self.mode = "loading"
+                self.status_message = "Loading data"
+                self.manual_smart_sync()
+
+        self.network.call_later(2, delayed_start)  # Show welcome for 2 seconds minimum
+
+    def build_background_composite(self, size):
+        """Pre-blend the background image with the dim overlay once, in display-native format"""
+        image = self.background_image
+        if image.get_size() != size:
+            image = pygame.transform.scale(image, size)
+        composite = pygame.Surface(size)
+        composite.blit(image, (0, 0))
+        overlay = pygame.Surface(size, pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 150))
+        composite.blit(overlay, (0, 0))
+        if pygame.display.get_surface() is not None:
+            composite = composite.convert()
+        self._background_composite = composite
+        self._background_key = (id(self.background_image), size)
+
     def draw_background_safely(self, screen):
         """Safely draw background image with error handling"""
         try:
             if self.background_image:
-                screen.blit(self.background_image, (0, 0))
-                overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-                overlay.fill((0, 0, 0, 150))
-                screen.blit(overlay, (0, 0))
+                # Rebuilt only when the image or the screen size changes
+                size = screen.get_size()
+                if self._background_composite is None or self._background_key != (id(self.background_image), size):
+                    self.build_background_composite(size)
+                screen.blit(self._background_composite, (0, 0))
             else:
                 screen.fill(BACKGROUND_COLOR)
         except Exception as e:
             print(f"Background error: {e}")
             screen.fill(BACKGROUND_COLOR)
-        def delayed_start():
-            time.sleep(2)  # Show welcome for 2 seconds minimum
-            if self.mode == "welcome":
-                self.mode = "loading"
-                self.status_message = "Loading data"
-                self.manual_smart_sync()
-        
-        threading.Thread(target=delayed_start, daemon=True).start()
+
     def start_smart_sync(self):
         """Start smart sync - load all data including contacts"""
-        def sync():
+        def sync(job):
             try:
-                import socket
-                socket.setdefaulttimeout(3)  # Timeout corto
-                self.status_message = "Connecting to WhatsApp..."
+                job.set(status_message="Connecting to WhatsApp...")
                 
-                # Test backend connection con timeout
-                response = requests.get(f"{self.backend_url}/status", timeout=3)
+                # Test backend connection con timeout corto
+                response = self.backend.get("status", "/status", timeout=(3, 3), retries=0)
                 if response.status_code == 200:
                     data = response.json()
                     if data.get("ready", False):
-                        self.connection_stable = True
-                        self.status_message = "Loading chats..."
-                        
-                        # Load chats
-                        self.load_chats_sync()
+                        job.set(connection_stable=True, status_message="Loading chats and contacts...")
                         
-                        # Load all contacts for search
-                        self.status_message = "Loading contacts..."
-                        self.load_contacts_sync()
+                        # Chats and contacts are independent - load both at once
+                        fetches = self.sync_coordinator.fetch_all(chats=self.load_chats_sync,
+                                                                  contacts=self.load_contacts_sync)
+                        chat_page = fetches["chats"].result()
+                        index = ContactSearchIndex(fetches["contacts"].result())
                         
                         # Mark as loaded and go to main menu
-                        self.data_loaded = True
-                        self.mode = "main_menu"
-                        self.status_message = f"Ready - {len(self.chats)} chats, {len(self.contacts)} contacts"
-                        self.error_message = ""
+                        job.call(self.finish_initial_load, chat_page, index)
                         return
                         
                 # Backend not ready - fallback
-                self.error_message = "Backend not ready"
-                time.sleep(2)  # Brief pause
-                self.mode = "main_menu"
-                self.status_message = "WhatsApp (offline mode)"
+                job.set(error_message="Backend not ready")
+                self.network.call_later(2, self.enter_offline_mode)  # Brief pause
                         
             except Exception as e:
                 print(f"WhatsApp sync error: {e}")
                 # Connection failed - go to main menu anyway
-                self.error_message = "Connection failed - offline mode"
-                time.sleep(2)  # Brief pause to show error
-                self.mode = "main_menu"
-                self.status_message = "WhatsApp (offline mode)"
-                self.data_loaded = True  # Mark as \"loaded\" to prevent retry
+                job.set(error_message="Connection failed - offline mode")
+                # Mark as "loaded" to prevent retry, after a brief pause to show the error
+                self.network.call_later(2, functools.partial(self.enter_offline_mode, mark_loaded=True))
         
-        threading.Thread(target=sync, daemon=True).start()
+        self.sync_coordinator.request(sync)
+
+    def finish_initial_load(self, chat_page, index):
+        self.chats.reset(*chat_page)
+        self.set_contacts(index.contacts, index)
+        self.data_loaded = True
+        self.mode = "main_menu"
+        self.status_message = f"Ready - {self.chats.total} chats, {len(self.contacts)} contacts"
+        self.error_message = ""
+
+    def enter_offline_mode(self, mark_loaded=False):
+        self.mode = "main_menu"
+        self.status_message = "WhatsApp (offline mode)"
+        if mark_loaded:
+            self.data_loaded = True
     
     def reset_account_data(self):
         """Delete all synchronized data from backend server"""
-        try:
-            response = requests.delete(f"{self.backend_url}/api/reset-account", timeout=10)
-            if response.status_code == 200:
-                self.mode = "reset_account_info"
-                self.status_message = "Account data deleted successfully"
-            else:
-                self.error_message = f"Reset failed: {response.status_code}"
-                self.mode = "main_menu"
-        except requests.exceptions.RequestException as e:
-            self.error_message = f"Reset failed: Connection error"
-            self.mode = "main_menu"
+        def reset(job):
+            try:
+                response = self.backend.delete("reset", "/api/reset-account")
+                if response.status_code == 200:
+                    if self.local_store:
+                        self.local_store.clear()
+                    job.set(sync_cursors={}, mode="reset_account_info",
+                            status_message="Account data deleted successfully")
+                else:
+                    job.set(error_message=f"Reset failed: {response.status_code}", mode="main_menu")
+            except requests.exceptions.RequestException as e:
+                job.set(error_message=f"Reset failed: Connection error", mode="main_menu")
+
+        self.network.submit("reset", reset, replace=False)
     
 
 
-    def manual_smart_sync(self):
-        """Manual Smart Sync - comprehensive data synchronization"""
-        def sync():
+    def delta_request_kwargs(self, kind):
+        """Query/header arguments asking the backend only for changes since our cursor"""
+        cursor = self.sync_cursors.get(kind)
+        if not cursor:
+            return {}
+        kwargs = {"params": {"since": cursor["version"]}}
+        if cursor.get("etag"):
+            kwargs["headers"] = {"If-None-Match": cursor["etag"]}
+        return kwargs
+
+    def parse_list_response(self, kind, response, current, record, sort_key, keep=None, on_progress=None):
+        """(merged list, new cursor) from a streamed /chats or /contacts response; list is None if unchanged (304) or failed
+
+        Entries become record (Chat or Contact) instances as they are read
+        (see StreamedList); those failing keep() are dropped on the spot and,
+        in a delta, also removed from the current list.
+        """
+        with response:
+            if response.status_code != 200:
+                return None, None
+            entries = StreamedList(response, kind, on_progress)
+            items, rejected = [], []
+            for entry in entries:
+                item = record.from_dict(entry)
+                if keep is None or keep(item):
+                    items.append(item)
+                else:
+                    rejected.append(item.id)
+        data = entries.meta
+        if not data.get("success", False):
+            return None, None
+        if data.get("delta"):
+            merged = merge_delta(current, items, data.get("removed", []) + rejected, sort_key)
+        else:
+            merged = sorted(items, key=sort_key) if sort_key else items
+        cursor = None
+        if data.get("version"):
+            cursor = {"version": data["version"], "etag": response.headers.get("ETag")}
+        return merged, cursor
+
+    def set_sync_cursor(self, kind, cursor):
+        if cursor:
+            self.sync_cursors[kind] = cursor
+        else:
+            self.sync_cursors.pop(kind, None)
+        self.save_sync_cursors()
+
+    def save_sync_cursors(self):
+        """Persist the sync cursors on the network worker; the write always takes the newest snapshot"""
+        if self.local_store:
+            self.sync_cursors["chat_window"] = self.chats.state()
+            self._saved_cursors = json.dumps(self.sync_cursors)
+            self.network.submit("persist_cursors",
+                                lambda job: self.local_store.set_meta("sync_cursors", self._saved_cursors))
+
+    def fetch_chat_list(self, on_progress=None):
+        """GET a delta of the loaded chat pages if we have a cursor, else the first page (blocking)
+
+        Returns (response, data); data is None unless the request succeeded.
+        The body is streamed, so data["chats"] already holds Chat records.
+        """
+        if self.sync_cursors.get("chats") and self.chats:
+            # With limit, a stale cursor (backend restarted) gets the first page back, not every chat
+            kwargs = self.delta_request_kwargs("chats")
+            kwargs["params"]["limit"] = self.chats.page_size
+            response = self.backend.get("chats", "/chats", stream=True, **kwargs)
+        else:
+            response = self.backend.get("chats", "/chats", stream=True, params={"limit": self.chats.page_size})
+        with response:
+            if response.status_code != 200:
+                return response, None
+            entries = StreamedList(response, "chats", on_progress)
+            chats = Chat.from_list(entries)
+        data = dict(entries.meta, chats=chats)
+        return response, (data if data.get("success", False) else None)
+
+    def fetch_contact_list(self, on_progress=None):
+        """GET /contacts (a delta if we have a cursor), streamed into Contact records (blocking)
+
+        Returns (response, contacts, cursor); contacts is None if unchanged (304) or failed.
+        """
+        response = self.backend.get("contacts", "/contacts", stream=True, **self.delta_request_kwargs("contacts"))
+        contacts, cursor = self.parse_list_response("contacts", response, self.contacts, Contact, contact_name_key,
+                                                    keep=valid_contact, on_progress=on_progress)
+        return response, contacts, cursor
+
+    def apply_chat_list(self, data, etag):
+        """Merge a fetch_chat_list() result into the chat window (main thread)"""
+        chats = data.get("chats", [])
+        if data.get("delta"):
+            self.chats.apply_delta(chats, data.get("removed", []), data.get("total"))
+        elif "nextCursor" in data:
+            self.chats.reset(chats, data.get("nextCursor"), data.get("total"))
+            etag = None  # ETag of a page, not of the whole list
+        else:
+            # Full list (backend without paging, or delta cursor no longer valid)
+            self.chats.reset(sorted(Chat.from_list(chats), key=chat_page_key))
+        cursor = {"version": data["version"], "etag": etag} if data.get("version") else None
+        self.set_sync_cursor("chats", cursor)
+        self.persist_chats()
+
+    def persist_chats(self):
+        """Write every loaded chat page to the local cache (off the main thread)
+
+        Like the cursors, the job writes the newest snapshot when it runs; the lock
+        keeps an overlapping older save from reading its snapshot, then landing last.
+        """
+        if self.local_store:
+            self._saved_chats = list(self.chats)
+
+            def write(job):
+                with self._save_chats_lock:
+                    self.local_store.save_chats(self._saved_chats)
+
+            self.network.submit("persist_chats", write)
+
+    def persist_chat_pages(self):
+        """A page loaded by scrolling: cache it with the window cursor, so a cold start shows it too"""
+        self.save_sync_cursors()
+        self.persist_chats()
+
+    def apply_synced_contacts(self, index, cursor):
+        self.set_contacts(index.contacts, index)
+        self.set_sync_cursor("contacts", cursor)
+
+    def return_to_menu_after_sync(self):
+        if self.mode == "smart_sync":
+            self.mode = "main_menu"
+            self.status_message = self.sync_status
+
+    # Share of sync_progress each stage is worth (contacts/chats advance while their bodies stream in)
+    SYNC_STAGE_PROGRESS = {"status": 20, "contacts": 40, "chats": 40}
+
+    def sync_contacts_stage(self, job, fetched):
+        """Apply the fetch_contact_list() result of a sync (worker thread) - returns the contact count"""
+        response, contacts, cursor = fetched
+        contact_count = len(self.contacts)
+
+        if response.status_code == 304:
+            job.set(sync_status=f"Contacts up to date ({contact_count})")
+        elif contacts is not None:
+            # Index is built here, off the UI thread
+            index = ContactSearchIndex(contacts)
+            contact_count = len(index.contacts)
+            if self.local_store:
+                self.local_store.save_contacts(index.contacts)
+            job.call(self.apply_synced_contacts, index, cursor)
+            job.set(sync_status=f"Loaded {contact_count} contacts")
+        elif response.status_code == 200:
+            contact_count = 0
+            job.call(self.set_contacts, [])
+            job.set(sync_status="No contacts available")
+        else:
+            # Keep the cached contacts
+            job.set(sync_status="Failed to load contacts")
+        return contact_count
+
+    def sync_chats_stage(self, job, fetched):
+        """Apply the fetch_chat_list() result of a sync (worker thread) - returns the chat count"""
+        response, data = fetched
+        chat_count = self.chats.total
+
+        if response.status_code == 304:
+            job.set(sync_status=f"Chats up to date ({chat_count})")
+        elif data is not None:
+            chat_count = data.get("total", len(data.get("chats", [])))
+            job.call(self.apply_chat_list, data, response.headers.get("ETag"))
+            verb = "Updated" if data.get("delta") else "Loaded"
+            job.set(sync_status=f"{verb} {len(data.get('chats', []))} of {chat_count} chats")
+        else:
+            # Keep the cached chats
+            job.set(sync_status="Failed to load chats")
+        return chat_count
+
+    def manual_smart_sync(self):
+        """Manual Smart Sync - comprehensive data synchronization (runs on the network worker)
+
+        /status, /contacts and /chats are requested concurrently; contacts and
+        chats are only applied once the status says WhatsApp is ready. Their
+        bodies are parsed as they stream in, moving sync_progress along.
+        """
+        def sync(job):
+            # Completed share of each stage
+            done = dict.fromkeys(self.SYNC_STAGE_PROGRESS, 0.0)
+
+            def progress(stage, fraction):
+                done[stage] = max(done[stage], fraction)
+                return int(sum(self.SYNC_STAGE_PROGRESS[name] * share for name, share in done.items()))
+
+            def receiving(stage):
+                def report(fraction, count):
+                    # The last 10% of a stage is applying what was received
+                    job.set(sync_status=f"Receiving {stage}... {count}",
+                            sync_progress=progress(stage, 0.9 * (fraction or 0)))
+                return report
+
             try:
-                self.sync_status = "Starting Smart Sync..."
-                self.sync_progress = 0
-                self.sync_complete = False
-                self.error_message = ""
+                job.set(sync_status="Starting Smart Sync...", sync_progress=0, sync_complete=False, error_message="")
+                fetches = self.sync_coordinator.fetch_all(
+                    status=lambda: self.backend.get("status", "/status", timeout=(3, 10)),
+                    contacts=functools.partial(self.fetch_contact_list, receiving("contacts")),
+                    chats=functools.partial(self.fetch_chat_list, receiving("chats")))
                 
                 # Step 1: Check backend status
-                self.sync_status = "Checking connection..."
-                self.sync_progress = 10
-                response = requests.get(f"{self.backend_url}/status", timeout=10)
+                job.set(sync_status="Checking connection...")
+                response = fetches["status"].result()
                 
                 if response.status_code != 200:
-                    self.error_message = "Backend not accessible"
-                    self.sync_complete = True
+                    job.set(error_message="Backend not accessible", sync_complete=True)
                     return
                 
                 data = response.json()
-                self.sync_status = f"Backend status: {data.get('status', 'Unknown')}"
-                self.sync_progress = 20
+                job.set(sync_status=f"Backend status: {data.get('status', 'Unknown')}",
+                        sync_progress=progress("status", 1))
                 
                 if not data.get("ready", False):
                     if data.get("hasQR", False):
-                        self.error_message = "Scan QR code first - visit http://localhost:3333"
+                        job.set(error_message=f"Scan QR code first - visit {self.backend_url}")
                     else:
-                        self.error_message = "WhatsApp not ready - initializing..."
-                    self.sync_complete = True
+                        job.set(error_message="WhatsApp not ready - initializing...")
+                    job.set(sync_complete=True)
                     return
                 
-                # Step 2: Load contacts
-                self.sync_status = "Loading contacts..."
-                self.sync_progress = 30
-                contacts_response = requests.get(f"{self.backend_url}/contacts", timeout=15)
-                
-                if contacts_response.status_code == 200:
-                    contacts_data = contacts_response.json()
-                    if contacts_data.get("success", False):
-                        self.contacts = contacts_data.get("contacts", [])
-                        self.sync_status = f"Loaded {len(self.contacts)} contacts"
-                        self.sync_progress = 50
-                    else:
-                        self.sync_status = "No contacts available"
-                        self.contacts = []
-                else:
-                    self.sync_status = "Failed to load contacts"
-                    self.contacts = []
-                
-                # Step 3: Load chats
-                self.sync_status = "Loading chats..."
-                self.sync_progress = 60
-                chats_response = requests.get(f"{self.backend_url}/chats", timeout=15)
-                
-                if chats_response.status_code == 200:
-                    chats_data = chats_response.json()
-                    if chats_data.get("success", False):
-                        self.chats = chats_data.get("chats", [])
-                        self.sync_status = f"Loaded {len(self.chats)} chats"
-                        self.sync_progress = 80
+                # Step 2: Contacts and chats, in whichever order they arrive
+                contact_count, chat_count = len(self.contacts), self.chats.total
+                stages = {fetches["contacts"]: "contacts", fetches["chats"]: "chats"}
+                for future in as_completed(stages):
+                    stage = stages[future]
+                    if stage == "contacts":
+                        contact_count = self.sync_contacts_stage(job, future.result())
                     else:
-                        self.sync_status = "No chats available"
-                        self.chats = []
-                else:
-                    self.sync_status = "Failed to load chats"
-                    self.chats = []
+                        chat_count = self.sync_chats_stage(job, future.result())
+                    job.set(sync_progress=progress(stage, 1))
                 
-                # Step 4: Complete
-                self.sync_progress = 100
-                self.sync_status = f"Sync complete! {len(self.contacts)} contacts, {len(self.chats)} chats"
-                self.data_loaded = True
-                self.connection_stable = True
-                self.sync_complete = True
+                # Step 3: Complete
+                job.set(sync_progress=100,
+                        sync_status=f"Sync complete! {contact_count} contacts, {chat_count} chats",
+                        data_loaded=True, connection_stable=True, sync_complete=True)
                 
                 # Auto-return to main menu after success
-                time.sleep(2)
-                if self.mode == "smart_sync":
-                    self.mode = "main_menu"
-                    self.status_message = self.sync_status
+                self.network.call_later(2, self.return_to_menu_after_sync)
                 
             except requests.exceptions.ConnectionError:
-                self.error_message = "Backend connection failed - is server running?"
-                self.sync_complete = True
+                job.set(error_message="Backend connection failed - is server running?", sync_complete=True)
             except requests.exceptions.Timeout:
-                self.error_message = "Sync timeout - server too slow"
-                self.sync_complete = True
+                job.set(error_message="Sync timeout - server too slow", sync_complete=True)
             except Exception as e:
-                self.error_message = f"Sync error: {str(e)[:40]}"
-                self.sync_complete = True
+                job.set(error_message=f"Sync error: {str(e)[:40]}", sync_complete=True)
         
-        threading.Thread(target=sync, daemon=True).start()
+        # A sync already in flight covers this request
+        if not self.sync_coordinator.request(sync):
+            print("DEBUG: Sync already running - joined it")
 
     def start_realtime_updates(self):
-        """Start real-time chat updates that preserve conversation history"""
-        def update_loop():
+        """Start real-time chat updates from the backend event stream (SSE)
+
+        A single persistent connection to /events delivers new messages as soon
+        as whatsapp-web.js sees them. Backends without /events fall back to the
+        old 1-second polling of the open chat.
+        """
+        def stream_loop():
+            backoff = 1
+            while True:
+                try:
+                    response = self.backend.get("events", "/events", stream=True,
+                                                headers={"Accept": "text/event-stream"})
+                    if response.status_code == 404:
+                        print("DEBUG: Backend has no /events stream - polling for new messages")
+                        response.close()
+                        poll_loop()
+                        return
+                    if response.status_code != 200:
+                        raise Exception(f"HTTP {response.status_code}")
+
+                    backoff = 1
+                    event_type, data_lines = "message", []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line is None:
+                            continue
+                        if line == "":
+                            # Blank line terminates one event
+                            if data_lines:
+                                self.network.post(functools.partial(
+                                    self.handle_stream_event, event_type, "\n".join(data_lines)))
+                            event_type, data_lines = "message", []
+                        elif line.startswith(":"):
+                            continue  # Heartbeat comment
+                        elif line.startswith("event:"):
+                            event_type = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data_lines.append(line[5:].lstrip())
+                    response.close()
+                except Exception as e:
+                    print(f"DEBUG: Event stream error: {e} - reconnecting in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+        def poll_loop():
             while True:
                 time.sleep(1)  # Check every 1 second for real-time updates
                 if self.connection_stable and self.current_chat and self.mode == "chat_view":
                     self.check_for_new_messages()
-                    
-        threading.Thread(target=update_loop, daemon=True).start()
-    
+
+        threading.Thread(target=stream_loop, daemon=True).start()
+
+    def handle_stream_event(self, event_type, data):
+        """Handle one event received from the backend stream (main thread)"""
+        if event_type != "message":
+            return
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return
+        self.prefetcher.invalidate(payload.get("chatId"))
+        current_chat = self.current_chat
+        if self.mode == "chat_view" and current_chat and payload.get("chatId") == current_chat.id:
+            self.add_incoming_message(payload.get("message") or {})
+
+    def add_incoming_message(self, raw_message):
+        """Append a message to the open conversation unless it is already there"""
+        if not raw_message or not raw_message.get("body"):
+            return False
+
+        message_id = serialized_message_id(raw_message) or str(time.time())
+
+        # Check if we already have this message
+        if message_id in self.current_messages:
+            return False
+
+        filtered_text = self.filter_text_only(raw_message.get("body"), message_id)
+        if not filtered_text or filtered_text in ["[Non-text content]", "[Filtered content]"]:
+            return False
+
+        new_message = Message.from_dict(raw_message)
+        new_message.id = message_id
+
+        # Add to the conversation (ordered by timestamp, oldest dropped when full)
+        if not self.current_messages.add(new_message):
+            return False
+        self.request_redraw()
+        if self.local_store and self.current_chat:
+            # SQLite commits stay off the UI thread (can take milliseconds on an SD card)
+            chat_id = self.current_chat.id
+            self.network.submit(None, lambda job: self.local_store.save_messages(chat_id, [new_message]))
+
+        # Auto-scroll to show new message
+        if self.mode == "chat_view":
+            self.message_scroll = 0
+
+        print(f"DEBUG: New message added to conversation")
+        return True
+
     def check_for_new_messages(self):
-        """Check for new messages without replacing the conversation"""
-        def check():
+        """Check for new messages without replacing the conversation (polling fallback)"""
+        chat = self.current_chat
+        if not chat or not chat.id:
+            return
+
+        def check(job):
             try:
-                if not self.current_chat or not self.current_chat.get("id"):
-                    return
-                
-                chat_id = self.current_chat.get("id", "").replace("@", "%40")
-                response = requests.get(f"{self.backend_url}/chat/{chat_id}", timeout=5)
+                chat_id = chat.id.replace("@", "%40")
+                response = self.backend.get("chat", f"/chat/{chat_id}", timeout=(3, 5), retries=0,
+                                            params={"includeMessages": "false"})
                 
                 if response.status_code == 200:
                     data = response.json()
                     if data.get("success", False):
                         chat_data = data.get("chat", {})
                         last_message = chat_data.get("lastMessage")
-                        
-                        if last_message and last_message.get("body"):
-                            # Check if this message is already in our conversation
-                            message_id = last_message.get("id", {})
-                            if isinstance(message_id, dict):
-                                message_id = message_id.get("_serialized", str(time.time()))
-                            else:
-                                message_id = str(message_id)
-                            
-                            # Check if we already have this message
-                            already_exists = False
-                            for existing_msg in self.current_messages:
-                                existing_id = existing_msg.get("id", "")
-                                if str(existing_id) == str(message_id):
-                                    already_exists = True
-                                    break
-                            
-                            # If it's a new message, add it to the conversation
-                            if not already_exists:
-                                filtered_text = self.filter_text_only(last_message.get("body"))
-                                if filtered_text and filtered_text not in ["[Non-text content]", "[Filtered content]"]:
-                                    new_message = {
-                                        "id": message_id,
-                                        "body": last_message.get("body"),
-                                        "fromMe": last_message.get("fromMe", False),
-                                        "timestamp": last_message.get("timestamp", int(time.time())),
-                                        "type": "chat"
-                                    }
-                                    
-                                    # Add to the end of conversation
-                                    self.current_messages.append(new_message)
-                                    
-                                    # Keep a reasonable limit of messages
-                                    if len(self.current_messages) > 100:
-                                        self.current_messages = self.current_messages[-100:]
-                                    
-                                    # Auto-scroll to show new message
-                                    if self.mode == "chat_view":
-                                        available_height = 170 - 50
-                                        line_height = 18
-                                        max_visible_lines = available_height // line_height
-                                        if len(self.current_messages) > max_visible_lines:
-                                            self.message_scroll = len(self.current_messages) - max_visible_lines
-                                    
-                                    print(f"DEBUG: New message added to conversation")
+                        if last_message:
+                            job.call(self.add_message_to_chat, chat, last_message)
                     
             except Exception as e:
                 print(f"DEBUG: Error checking for new messages: {e}")
         
-        threading.Thread(target=check, daemon=True).start()
+        self.network.submit("poll", check, replace=False)
+
+    def add_message_to_chat(self, chat, raw_message):
+        """add_incoming_message, if chat is still the open one (main thread)"""
+        if self.current_chat is chat:
+            self.add_incoming_message(raw_message)
+
     def load_chats_sync(self):
-        """Load chat list synchronously"""
+        """Load the first chat page synchronously - returns (chats, next_cursor, total)"""
         try:
-            response = requests.get(f"{self.backend_url}/chats", timeout=10)
+            response = self.backend.get("chats", "/chats", timeout=(3, 10),
+                                        params={"limit": self.chats.page_size})
             
             if response.status_code == 200:
                 data = response.json()
                 raw_chats = data.get("chats", [])
                 
                 # Filter and validate chats
-                self.chats = []
-                for chat in raw_chats:
-                    if chat.get("name") and chat.get("id"):
-                        self.chats.append(chat)
+                valid_chats = [chat for chat in Chat.from_list(raw_chats) if chat.name and chat.id]
                 
-                print(f"DEBUG: Loaded {len(self.chats)} valid chats")
+                print(f"DEBUG: Loaded {len(valid_chats)} valid chats")
+                return valid_chats, data.get("nextCursor"), data.get("total")
                 
             else:
                 raise Exception(f"Failed to load chats: HTTP {response.status_code}")
@@ -438,161 +2388,109 @@ class WhatsApp:
             raise e
 
     def load_contacts_sync(self):
-        """Load all contacts synchronously - NO LIMITS"""
+        """Load all contacts synchronously - NO LIMITS (returns them sorted)"""
         try:
-            response = requests.get(f"{self.backend_url}/contacts", timeout=15)
+            response = self.backend.get("contacts", "/contacts", stream=True)
             
             if response.status_code == 200:
-                data = response.json()
-                raw_contacts = data.get("contacts", [])
-                
-                # Filter and validate contacts - keep ALL valid ones
-                self.contacts = []
-                for contact in raw_contacts:
-                    name = contact.get("name", "").strip()
-                    contact_id = contact.get("id", "")
-                    
-                    # Only filter out completely invalid entries
-                    if name and name != "Unknown" and name != "" and contact_id:
-                        self.contacts.append({
-                            "id": contact_id,
-                            "name": name,
-                            "phone": contact.get("phone", ""),
-                            "pushname": contact.get("pushname", name)
-                        })
-                
-                # Sort contacts alphabetically for better search experience
-                self.contacts.sort(key=lambda x: x.get("name", "").lower())
+                # Streamed: invalid entries are dropped as they arrive - keep ALL valid ones,
+                # sorted alphabetically for better search experience
+                contacts, _ = self.parse_list_response("contacts", response, [], Contact, contact_name_key,
+                                                       keep=valid_contact)
+                contacts = contacts or []
                 
-                print(f"DEBUG: Loaded {len(self.contacts)} valid contacts")
+                print(f"DEBUG: Loaded {len(contacts)} valid contacts")
+                return contacts
                 
             else:
+                response.close()
                 raise Exception(f"Failed to load contacts: HTTP {response.status_code}")
                 
         except Exception as e:
             print(f"DEBUG: Contact loading error: {e}")
             raise e
     
+    def set_contacts(self, contacts, index=None):
+        """Replace the contact list and its search index (pass a prebuilt index to skip the rebuild)"""
+        if index is None:
+            index = ContactSearchIndex(contacts)
+        self.contact_names_by_id = {
+            contact.id: contact.name for contact in index.contacts if contact.id
+        }
+        self.contact_index = index
+        self.contacts = index.contacts
+        # Only messages of the open chat whose author now resolves to another name are re-wrapped
+        renamed = {participant_id for participant_id, name in self._participant_names.items()
+                   if self.resolve_participant_name(participant_id) != name}
+        if renamed:
+            for participant_id in renamed:
+                del self._participant_names[participant_id]
+            for message in self.current_messages:
+                if (message.author or message.participant) in renamed:
+                    self.layout_cache.invalidate(message.id or id(message))
+
     def search_contacts(self, query):
         """Search contacts by name - returns all matches"""
-        if not query.strip():
-            self.search_results = []
-            return
-        
-        query_lower = query.lower().strip()
-        self.search_results = []
-        
-        for contact in self.contacts:
-            name = contact.get("name", "").lower()
-            if query_lower in name:
-                self.search_results.append(contact)
+        self.search_results = self.contact_index.search(query)
         
         # Reset selection when search results change
         self.selected_contact_index = 0
-        
-        print(f"DEBUG: Search '{query}' found {len(self.search_results)} results")
     
-    def filter_text_only(self, text):
+    def filter_text_only(self, text, message_id=None):
         """Filter text to remove emojis, emoticonos, multimedia references and keep only readable text"""
-        if not text:
-            return ""
-        
-        try:
-            # Convert to string and handle None
-            text = str(text) if text is not None else ""
-            
-            # Remove common multimedia indicators
-            multimedia_patterns = [
-                "image omitted", "video omitted", "audio omitted", "document omitted",
-                "sticker omitted", "gif omitted", "location omitted", "contact omitted",
-                "[IMAGE]", "[VIDEO]", "[AUDIO]", "[DOCUMENT]", "[STICKER]", "[GIF]",
-                "[LOCATION]", "[CONTACT]", "📷", "🎥", "🎵", "📄", "📍"
-            ]
-            
-            text_lower = text.lower()
-            for pattern in multimedia_patterns:
-                if pattern.lower() in text_lower:
-                    return "[Media content]"
-            
-            # Remove URLs
-            import re
-            text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[Link]', text)
-            text = re.sub(r'www\.(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[Link]', text)
-            
-            # Filter out problematic Unicode characters (emojis, symbols)
-            filtered_chars = []
-            for char in text:
-                try:
-                    # Keep only basic Latin, Latin extended, numbers, punctuation and common symbols
-                    if ord(char) <= 0xFFFF:  # Basic Multilingual Plane
-                        if (ord(char) < 32 and char not in '\n\r\t') or \
-                           (0x2600 <= ord(char) <= 0x26FF) or \
-                           (0x2700 <= ord(char) <= 0x27BF) or \
-                           (0x1F600 <= ord(char) <= 0x1F64F) or \
-                           (0x1F300 <= ord(char) <= 0x1F5FF) or \
-                           (0x1F680 <= ord(char) <= 0x1F6FF) or \
-                           (0x1F1E6 <= ord(char) <= 0x1F1FF):
-                            # Skip emojis and special symbols
-                            continue
-                        else:
-                            filtered_chars.append(char)
-                    # Skip characters above BMP (like some emojis)
-                except ValueError:
-                    continue
-            
-            filtered_text = ''.join(filtered_chars).strip()
-            
-            # If the text is empty after filtering, provide a placeholder
-            if not filtered_text:
-                return "[Non-text content]"
-            
-            # Limit length to prevent display issues
-            if len(filtered_text) > 200:
-                filtered_text = filtered_text[:197] + "..."
-            
-            return filtered_text
-            
-        except Exception as e:
-            print(f"Text filtering error: {e}")
-            return "[Filtered content]"
+        return TEXT_SANITIZER.sanitize(text, message_id)
+
     def safe_render_text(self, text, font, color):
         """Safely render text avoiding Unicode errors"""
         try:
             if not text or text.strip() == "":
-                return font.render("[Empty]", True, color)
+                return TEXT_SURFACE_CACHE.render(font, "[Empty]", True, color)
             
             # Additional safety filter
             safe_text = self.filter_text_only(text)
             
             # Try to render the text
-            return font.render(safe_text, True, color)
+            return TEXT_SURFACE_CACHE.render(font, safe_text, True, color)
             
         except Exception as e:
             print(f"Safe render error: {e}")
             # Fallback to a simple message
             try:
-                return font.render("[Text content]", True, color)
+                return TEXT_SURFACE_CACHE.render(font, "[Text content]", True, color)
             except:
                 return font.render("MESSAGE", True, color)
     def get_participant_name(self, message):
         """Get participant name for group messages from contacts or fallback to phone"""
-        if message.get('fromMe', False):
+        if message.from_me:
             return 'You'
         
         # Check if this is a group chat
-        if not self.current_chat or not self.current_chat.get('isGroup', False):
-            return str(self.current_chat.get('name', 'Contact'))[:8] if self.current_chat else 'Contact'
+        if not self.current_chat or not self.current_chat.is_group:
+            return (self.current_chat.name or 'Contact')[:8] if self.current_chat else 'Contact'
         
         # For group messages, try to get participant info
-        participant_id = message.get('author', '') or message.get('participant', '') or message.get('from', '')
+        participant_id = message.author or message.participant
         
         if not participant_id:
             return 'Unknown'
         
+        # Resolved names are cached per open chat
+        chat_id = self.current_chat.id
+        if chat_id != self._participant_chat_id:
+            self._participant_chat_id = chat_id
+            self._participant_names = {}
+        name = self._participant_names.get(participant_id)
+        if name is None:
+            name = self.resolve_participant_name(participant_id)
+            self._participant_names[participant_id] = name
+        return name
+
+    def resolve_participant_name(self, participant_id):
+        """Contact name for a participant id, or a phone number derived from the id"""
         # First try to find in contacts by ID
-        for contact in self.contacts:
-            if contact.get('id', '') == participant_id:
-                return str(contact.get('name', ''))[:10]
+        name = self.contact_names_by_id.get(participant_id)
+        if name is not None:
+            return name[:10]
         
         # If not found in contacts, try to extract phone number from participant_id
         # WhatsApp IDs are usually in format: phone@c.us or phone@g.us
@@ -606,181 +2504,310 @@ class WhatsApp:
         
         # Fallback to truncated participant ID
         return str(participant_id)[:10]
-    def load_chat_messages(self, chat):
-        """Load messages for selected chat and filter unsupported content"""
-        def load():
+    def text_messages(self, messages):
+        """Valid text messages from a backend response, normalized and sorted by timestamp"""
+        filtered_messages = []
+        for msg in messages:
+            if msg and msg.get("body"):
+                filtered_text = self.filter_text_only(msg.get("body"), serialized_message_id(msg))
+                if filtered_text and filtered_text not in ["[Non-text content]", "[Filtered content]"]:
+                    # Compact record with the required fields filled in
+                    filtered_messages.append(Message.from_dict(msg))
+
+        # Sort messages by timestamp to ensure proper order
+        filtered_messages.sort(key=lambda message: message.timestamp)
+        return filtered_messages
+
+    def load_older_messages(self):
+        """Fetch the page before the oldest loaded message and prepend it (background)
+
+        message_scroll counts lines up from the newest message, so prepending
+        leaves the visible lines where they are.
+        """
+        chat = self.current_chat
+        messages = self.current_messages
+        if (self.history_loading or self.history_exhausted or not chat or not chat.id
+                or not messages or not messages.room):
+            return
+        oldest_id = serialized_message_id(messages[0])
+        if not oldest_id or oldest_id.startswith("system"):
+            self.history_exhausted = True
+            return
+
+        def load(job):
+            older, has_more = None, True  # None: request failed, try again on the next scroll
             try:
-                if not chat or not chat.get("id"):
-                    self.error_message = "Invalid chat selected"
-                    return
-                    
-                chat_id = chat.get("id", "").replace("@", "%40")
-                
-                # Try to load existing messages first
-                response = requests.get(f"{self.backend_url}/chat/{chat_id}", timeout=15)
-                
+                chat_id = chat.id.replace("@", "%40")
+                response = self.backend.get("messages", f"/chat/{chat_id}/messages",
+                                            params={"before": oldest_id, "limit": HISTORY_PAGE_SIZE})
                 if response.status_code == 200:
                     data = response.json()
                     if data.get("success", False):
-                        # Get all messages from the response
-                        messages = []
-                        
-                        # Check different possible message locations in the response
-                        if "messages" in data and data["messages"]:
-                            messages = data.get("messages", [])
-                            print(f"DEBUG: Found {len(messages)} messages in data.messages")
-                        elif "chat" in data and data["chat"].get("messages"):
-                            messages = data["chat"].get("messages", [])
-                            print(f"DEBUG: Found {len(messages)} messages in data.chat.messages")
-                        elif "chat" in data and data["chat"].get("lastMessage"):
-                            # Try multiple endpoints to get full conversation history
-                            try:
-                                # Try endpoint 1: /chat/{id}/messages
-                                history_response = requests.get(f"{self.backend_url}/chat/{chat_id}/messages", timeout=15)
-                                if history_response.status_code == 200:
-                                    history_data = history_response.json()
-                                    if history_data.get("success", False) and history_data.get("messages"):
-                                        messages = history_data.get("messages", [])
-                                        print(f"DEBUG: Got {len(messages)} messages from /chat/{chat_id}/messages")
-                                    else:
-                                        # Try endpoint 2: /api/chat/{id}/history  
-                                        history_response2 = requests.get(f"{self.backend_url}/api/chat/{chat_id}/history", timeout=15)
-                                        if history_response2.status_code == 200:
-                                            history_data2 = history_response2.json()
-                                            if history_data2.get("success", False) and history_data2.get("messages"):
-                                                messages = history_data2.get("messages", [])
-                                                print(f"DEBUG: Got {len(messages)} messages from history endpoint 2")
-                                            else:
-                                                messages = [data["chat"].get("lastMessage")]
-                                                print("DEBUG: Using only lastMessage (no history)")
-                                        else:
-                                            messages = [data["chat"].get("lastMessage")]
-                                            print("DEBUG: History endpoint 2 failed, using lastMessage")
-                                else:
-                                    messages = [data["chat"].get("lastMessage")]
-                                    print("DEBUG: History endpoint 1 failed, using lastMessage")
-                            except Exception as ex:
-                                print(f"DEBUG: Exception getting history: {ex}")
-                                messages = [data["chat"].get("lastMessage")]
-                                print("DEBUG: Exception getting history, using lastMessage")
-                        
-                        # If still no messages, try one more endpoint for archived conversations
-                        if not messages:
-                            try:
-                                archived_response = requests.get(f"{self.backend_url}/api/conversations/{chat_id}", timeout=10)
-                                if archived_response.status_code == 200:
-                                    archived_data = archived_response.json()
-                                    if archived_data.get("messages"):
-                                        messages = archived_data.get("messages", [])
-                                        print(f"DEBUG: Got {len(messages)} messages from archived conversations")
-                            except:
-                                pass  # Continue with empty messages
-                        
-                        # Filter valid text messages
-                        filtered_messages = []
-                        for msg in messages:
-                            if msg and msg.get("body"):
-                                filtered_text = self.filter_text_only(msg.get("body"))
-                                if filtered_text and filtered_text not in ["[Non-text content]", "[Filtered content]"]:
-                                    # Ensure message has required fields
-                                    formatted_msg = {
-                                        "id": msg.get("id", str(time.time())),
-                                        "body": msg.get("body"),
-                                        "fromMe": msg.get("fromMe", False),
-                                        "timestamp": msg.get("timestamp", int(time.time())),
-                                        "type": msg.get("type", "chat"),
-                                        "author": msg.get("author", ""),
-                                        "participant": msg.get("participant", "")
-                                    }
-                                    filtered_messages.append(formatted_msg)
-                        
-                        print(f"DEBUG: Filtered to {len(filtered_messages)} valid messages")
-                        
-                        # Sort messages by timestamp to ensure proper order
-                        if filtered_messages:
-                            try:
-                                filtered_messages.sort(key=lambda x: int(x.get("timestamp", 0)))
-                            except:
-                                pass  # Keep original order if sorting fails
-                        
-                        self.current_messages = filtered_messages
-                        self.current_chat = chat
-                        self.mode = "chat_view"
-                        self.message_scroll = 0  # Reset scroll on new chat
-                        
-                        if filtered_messages:
-                            self.status_message = f"Chat: {chat.get('name', 'Unknown')} - {len(filtered_messages)} messages"
-                        else:
-                            self.status_message = f"Chat: {chat.get('name', 'Unknown')} - No messages found"
-                        
-                        self.error_message = ""
-                        return
+                        older = self.text_messages(data.get("messages", []))
+                        has_more = data.get("hasMore", False)
+            except Exception as e:
+                print(f"DEBUG: Error loading older messages: {e}")
+            job.call(self.prepend_history, chat, older, has_more)
+
+        self.history_loading = True
+        self.network.submit("history", load)
+
+    def prepend_history(self, chat, older, has_more):
+        """Put a page of older messages in front of the open conversation (main thread)"""
+        self.history_loading = False
+        if self.current_chat is not chat or older is None:
+            return
+        added = self.current_messages.prepend(older)
+        # Backends without ?before= answer with the newest page: nothing older gets added
+        if not added or not has_more or not self.current_messages.room:
+            self.history_exhausted = True
+        if added:
+            print(f"DEBUG: Loaded {added} older messages ({len(self.current_messages)} total)")
+            self.request_redraw()
+
+    def load_chat_messages(self, chat):
+        """Load messages for selected chat and filter unsupported content
+
+        A page warmed by the prefetcher opens with no request at all. Otherwise
+        cached messages from the local store are shown immediately and the
+        backend response is merged into the open conversation in the background.
+        Opening another chat cancels this load (network worker key "chat").
+        """
+        if not chat or not chat.id:
+            self.error_message = "Invalid chat selected"
+            return
+
+        self.network.cancel("history")
+        self.history_loading = False
+        self.history_exhausted = False
+
+        prefetched = self.prefetcher.take(chat.id)
+        if prefetched is not None:
+            messages, has_more = prefetched
+            self.network.cancel("chat")
+            self.show_chat_messages(chat, messages, False, has_more)
+            return
+
+        cached = []
+        if self.local_store:
+            cached = self.local_store.load_messages(chat.id)
+
+        def load(job):
+            try:
+                response, messages, has_more = self.fetch_latest_messages(chat)
+                
+                if messages is not None:
+                    filtered_messages = self.text_messages(messages)
+                    print(f"DEBUG: Filtered to {len(filtered_messages)} valid messages")
+                    
+                    if self.local_store:
+                        self.local_store.save_messages(chat.id, filtered_messages)
+                    
+                    job.call(self.show_chat_messages, chat, filtered_messages, bool(cached), has_more)
+                    return
                 
                 # If API call failed, show error but still allow new conversation
                 print(f"DEBUG: API call failed with status {response.status_code if response else 'None'}")
+                if cached:
+                    job.call(self.mark_chat_offline, chat)
+                    return
                 
                 # Create a new chat conversation for new contacts
-                self.current_messages = [
-                    {
-                        "id": "system1",
-                        "body": f"Starting conversation with {chat.get('name', 'Unknown')}",
-                        "timestamp": int(time.time()),
-                        "fromMe": False,
-                        "type": "system"
-                    }
-                ]
-                self.current_chat = chat
-                self.mode = "chat_view"
-                self.message_scroll = 0
-                self.status_message = f"New Chat: {chat.get('name', 'Unknown')}"
-                self.error_message = ""
+                job.call(self.open_new_conversation, chat)
                     
             except Exception as e:
-                self.error_message = f"Load error: {str(e)[:30]}"
+                if cached:
+                    job.call(self.mark_chat_offline, chat)
+                else:
+                    job.set(error_message=f"Load error: {str(e)[:30]}")
                 print(f"DEBUG: Load error: {e}")
         
-        self.status_message = "Loading chat..."
-        threading.Thread(target=load, daemon=True).start()
+        if cached:
+            # Render from disk right away
+            self.layout_cache.clear()
+            self.current_messages = ConversationStore(cached)
+            self.current_chat = chat
+            self.mode = "chat_view"
+            self.message_scroll = 0
+            self.error_message = ""
+            self.status_message = f"Chat: {chat.name or 'Unknown'} - updating..."
+        else:
+            self.status_message = "Loading chat..."
+        self.network.submit("chat", load)
+
+    def fetch_latest_messages(self, chat):
+        """GET the latest messages of a chat (blocking) - (response, messages, has_more)
+
+        messages is None if the request failed.
+        """
+        chat_id = chat.id.replace("@", "%40")
+        if not self.backend.supports("messages"):
+            # Backend without a manifest - probe its endpoints one by one
+            response, messages = self.fetch_chat_messages_legacy(chat_id)
+            return response, messages, True
+
+        # One round trip: chat info, the latest page and whether there is more
+        response = self.backend.get("messages", f"/chat/{chat_id}/messages", params={"limit": HISTORY_PAGE_SIZE})
+        data = response.json() if response.status_code == 200 else {}
+        messages = data.get("messages", []) if data.get("success", False) else None
+        return response, messages, data.get("hasMore", True)
+
+    def prefetch_chat_messages(self, chat):
+        """ChatPrefetcher fetch: (text messages, has_more) of a chat, or None (worker thread)"""
+        response, messages, has_more = self.fetch_latest_messages(chat)
+        if messages is None:
+            return None
+        messages = self.text_messages(messages)
+        if self.local_store:
+            self.local_store.save_messages(chat.id, messages)
+        return messages, has_more
+
+    def fetch_chat_messages_legacy(self, chat_id):
+        """Chat history from backends without /capabilities: /chat/{id}, then each history endpoint in turn
+
+        Returns (response of /chat/{id}, messages); messages is None if that request failed.
+        """
+        response = self.backend.get("chat", f"/chat/{chat_id}")
+        if response.status_code != 200:
+            return response, None
+        data = response.json()
+        if not data.get("success", False):
+            return response, None
+
+        # Get all messages from the response
+        messages = []
+        
+        # Check different possible message locations in the response
+        if "messages" in data and data["messages"]:
+            messages = data.get("messages", [])
+            print(f"DEBUG: Found {len(messages)} messages in data.messages")
+        elif "chat" in data and data["chat"].get("messages"):
+            messages = data["chat"].get("messages", [])
+            print(f"DEBUG: Found {len(messages)} messages in data.chat.messages")
+        elif "chat" in data and data["chat"].get("lastMessage"):
+            # Try multiple endpoints to get full conversation history
+            try:
+                # Try endpoint 1: /chat/{id}/messages
+                history_response = self.backend.get("messages", f"/chat/{chat_id}/messages")
+                if history_response.status_code == 200:
+                    history_data = history_response.json()
+                    if history_data.get("success", False) and history_data.get("messages"):
+                        messages = history_data.get("messages", [])
+                        print(f"DEBUG: Got {len(messages)} messages from /chat/{chat_id}/messages")
+                    else:
+                        # Try endpoint 2: /api/chat/{id}/history  
+                        history_response2 = self.backend.get("history", f"/api/chat/{chat_id}/history", timeout=(3, 15))
+                        if history_response2.status_code == 200:
+                            history_data2 = history_response2.json()
+                            if history_data2.get("success", False) and history_data2.get("messages"):
+                                messages = history_data2.get("messages", [])
+                                print(f"DEBUG: Got {len(messages)} messages from history endpoint 2")
+                            else:
+                                messages = [data["chat"].get("lastMessage")]
+                                print("DEBUG: Using only lastMessage (no history)")
+                        else:
+                            messages = [data["chat"].get("lastMessage")]
+                            print("DEBUG: History endpoint 2 failed, using lastMessage")
+                else:
+                    messages = [data["chat"].get("lastMessage")]
+                    print("DEBUG: History endpoint 1 failed, using lastMessage")
+            except Exception as ex:
+                print(f"DEBUG: Exception getting history: {ex}")
+                messages = [data["chat"].get("lastMessage")]
+                print("DEBUG: Exception getting history, using lastMessage")
+        
+        # If still no messages, try one more endpoint for archived conversations
+        if not messages:
+            try:
+                archived_response = self.backend.get("history", f"/api/conversations/{chat_id}")
+                if archived_response.status_code == 200:
+                    archived_data = archived_response.json()
+                    if archived_data.get("messages"):
+                        messages = archived_data.get("messages", [])
+                        print(f"DEBUG: Got {len(messages)} messages from archived conversations")
+            except:
+                pass  # Continue with empty messages
+
+        return response, messages
+
+    def show_chat_messages(self, chat, messages, cached, has_more=True):
+        """Show loaded messages: merge into the cached copy on screen, or open the chat (main thread)"""
+        if cached:
+            if self.current_chat is not chat:
+                return  # User left this chat while it was loading
+            # Already showing the cached copy - merge only what is new
+            self.history_exhausted = not has_more
+            added = sum(1 for message in messages if self.current_messages.add(message))
+            if added:
+                self.request_redraw()
+            self.status_message = f"Chat: {chat.name or 'Unknown'} - {len(self.current_messages)} messages"
+            self.error_message = ""
+            return
+
+        self.layout_cache.clear()
+        self.current_messages = ConversationStore(messages)
+        self.current_chat = chat
+        self.mode = "chat_view"
+        self.message_scroll = 0  # Reset scroll on new chat
+        self.history_exhausted = not has_more
+        
+        if messages:
+            self.status_message = f"Chat: {chat.name or 'Unknown'} - {len(messages)} messages"
+        else:
+            self.status_message = f"Chat: {chat.name or 'Unknown'} - No messages found"
+        
+        self.error_message = ""
+
+    def mark_chat_offline(self, chat):
+        if self.current_chat is chat:
+            self.status_message = f"Chat: {chat.name or 'Unknown'} (offline - cached)"
+
+    def open_new_conversation(self, chat):
+        """Open a chat with no history yet (new contact, or the backend could not load it)"""
+        self.current_messages = ConversationStore([
+            Message("system1", f"Starting conversation with {chat.name or 'Unknown'}", timestamp=int(time.time()),
+                    type="system")
+        ])
+        self.current_chat = chat
+        self.mode = "chat_view"
+        self.message_scroll = 0
+        self.status_message = f"New Chat: {chat.name or 'Unknown'}"
+        self.error_message = ""
     def send_message(self, message):
         """Send message to current chat"""
-        def send():
+        chat = self.current_chat
+        if not chat or not message.strip():
+            return
+
+        def send(job):
             try:
-                if not self.current_chat or not message.strip():
-                    return
-                
-                chat_id = self.current_chat.get("id", "")
+                chat_id = chat.id
                 
                 # Use the send-message endpoint directly
                 data = {"to": chat_id, "message": message.strip()}
                 
-                self.status_message = "Sending message..."
-                response = requests.post(f"{self.backend_url}/send-message", json=data, timeout=15)
+                job.set(status_message="Sending message...")
+                response = self.backend.post("send", "/send-message", json=data)
                 
                 if response.status_code == 200:
                     result = response.json()
                     if result.get("success", False):
-                        self.status_message = "Message sent!"
-                        # Add message to current messages
-                        new_message = {
-                            "body": message.strip(),
-                            "fromMe": True,
-                            "timestamp": int(time.time() * 1000)
-                        }
-                        self.current_messages.append(new_message)
-                        # Keep reasonable number of messages
-                        if len(self.current_messages) > 15:
-                            self.current_messages = self.current_messages[-100:]
-                        self.error_message = ""
+                        job.set(status_message="Message sent!")
+                        # Add message to current messages - with its id so the event stream echo is deduplicated
+                        job.call(self.add_message_to_chat, chat,
+                                 Message(result.get("messageId"), message.strip(), from_me=True, timestamp=int(time.time())))
+                        job.set(error_message="")
                     else:
-                        self.error_message = result.get("error", "Failed to send message")
+                        job.set(error_message=result.get("error", "Failed to send message"))
                 else:
-                    self.error_message = "Failed to send message"
+                    job.set(error_message="Failed to send message")
                     
             except Exception as e:
-                self.error_message = f"Send error: {str(e)[:30]}"
+                job.set(error_message=f"Send error: {str(e)[:30]}")
                 print(f"DEBUG: Send error: {e}")
         
-        threading.Thread(target=send, daemon=True).start()
+        # Sends are never cancelled by later ones
+        self.network.submit(None, send)
         
     def handle_events(self, event):
         """Main event handler for LightBerry OS"""
@@ -805,8 +2832,12 @@ class WhatsApp:
                         self._came_from_search = False
                     else:
                         self.mode = "chat_list"
+                        self.prefetcher.warm(self.chats, self.selected_chat_index)
+                    self.network.cancel("chat")
+                    self.network.cancel("history")
+                    self.history_loading = False
                     self.current_chat = None
-                    self.current_messages = []
+                    self.current_messages = ConversationStore()
                 elif self.mode == "contact_search":
                     self.mode = "main_menu"
                     self.search_input = ""
@@ -875,6 +2906,8 @@ class WhatsApp:
                 if len(self.chats) > 0:
                     self.mode = "chat_list"
                     self.selected_chat_index = 0
+                    self.chats.ensure_loaded(0)
+                    self.prefetcher.warm(self.chats, 0)
                 else:
                     self.error_message = "No chats available"
             elif self.selected_menu_index == 1:  # New Chat
@@ -917,10 +2950,13 @@ class WhatsApp:
             if event.key == pygame.K_UP:
                 if self.selected_chat_index > 0:
                     self.selected_chat_index -= 1
+                self.prefetcher.warm(self.chats, self.selected_chat_index)
                     
             elif event.key == pygame.K_DOWN:
                 if self.selected_chat_index < len(self.chats) - 1:
                     self.selected_chat_index += 1
+                self.chats.ensure_loaded(self.selected_chat_index)
+                self.prefetcher.warm(self.chats, self.selected_chat_index)
                     
             elif event.key == pygame.K_RETURN:
                 if 0 <= self.selected_chat_index < len(self.chats):
@@ -966,20 +3002,15 @@ class WhatsApp:
     def handle_chat_view_input(self, event):
         """Handle chat view navigation with proper scrolling"""
         if event.key == pygame.K_UP:
-            # Scroll up (show older messages)
-            if self.message_scroll > 0:
-                self.message_scroll -= 1
+            # Scroll up (show older messages) - one wrapped line at a time
+            if self.message_scroll < getattr(self, '_max_message_scroll', 0):
+                self.message_scroll += 1
+            if self.message_scroll >= getattr(self, '_max_message_scroll', 0) - HISTORY_PREFETCH_LINES:
+                self.load_older_messages()
         elif event.key == pygame.K_DOWN:
             # Scroll down (show newer messages)
-            # Calculate maximum scroll based on total messages and visible area
-            available_height = 170 - 50  # messages_end_y - messages_start_y
-            line_height = 18
-            max_visible_lines = available_height // line_height
-            
-            if len(self.current_messages) > max_visible_lines:
-                max_scroll = len(self.current_messages) - max_visible_lines
-                if self.message_scroll < max_scroll:
-                    self.message_scroll += 1
+            if self.message_scroll > 0:
+                self.message_scroll -= 1
         elif event.key == pygame.K_RETURN:
             # Enter compose mode
             self.compose_mode = True
@@ -1080,12 +3111,16 @@ class WhatsApp:
                 self.error_message = "Connection timeout"
         
         # Auto-sync inmediato cuando llega al main menu
-        if self.mode == "main_menu" and not self.data_loaded and not hasattr(self, "_auto_sync_done"):
+        if self.mode == "main_menu" and not hasattr(self, "_auto_sync_done"):
             self._auto_sync_done = True
-            print("🔄 Auto-sync ejecutándose...")
-            self.mode = "smart_sync"
-            self.manual_smart_sync()
-            threading.Thread(target=self.manual_smart_sync, daemon=True).start()
+            if self.data_loaded:
+                # Chats already shown from the local cache - refresh them in the background
+                print("🔄 Auto-sync en segundo plano (datos en caché)...")
+                self.manual_smart_sync()
+            else:
+                print("🔄 Auto-sync ejecutándose...")
+                self.mode = "smart_sync"
+                self.manual_smart_sync()
     def draw_splash_screen(self, screen):
         """Draw splash screen with WhatsApp image"""
         try:
@@ -1134,54 +3169,70 @@ class WhatsApp:
             title_x = (self.screen_width - title.get_width()) // 2
             title_y = (self.screen_height - title.get_height()) // 2
             screen.blit(title, (title_x, title_y))
+    def apply_network_updates(self):
+        """Apply results posted by the network worker - called by the main loop once per frame"""
+        for update in self.network.drain():
+            for name, value in update.changes:
+                setattr(self, name, value)
+            if update.action is not None:
+                try:
+                    update.action()
+                except Exception as e:
+                    print(f"DEBUG: Error applying network update: {e}")
+
     def cleanup(self):
         """Clean up resources"""
-        pass
+        self.sync_coordinator.close()
+        self.network.close()
+        self.backend.close()
     
     def draw(self, screen):
         """Main draw method"""
         try:
+            self.damage.begin_frame((self.mode, self.compose_mode))
             screen.fill(BACKGROUND_COLOR)
-        
-            if self.mode == "splash":
-                self.draw_splash_screen(screen)
-                return
-            
-            if self.mode == "welcome":
-                self.draw_welcome_screen(screen)
-            elif self.mode == "loading":
-                self.draw_loading_screen(screen)
-            elif self.mode == "main_menu":
-                self.draw_main_menu(screen)
-            elif self.mode == "chat_list":
-                self.draw_chat_list(screen)
-            elif self.mode == "contact_search":
-                self.draw_contact_search(screen)
-            elif self.mode == "qr_scan":
-                self.draw_qr_scan(screen)
-            elif self.mode == "smart_sync":
-                self.draw_smart_sync(screen)
-            elif self.mode == "reset_account_info":
-                self.draw_reset_account_info(screen)
-            elif self.mode == "chat_view":
-                if self.compose_mode:
-                    self.draw_compose_screen(screen)
-                else:
-                    self.draw_chat_view(screen)
-            elif self.mode == "error":
-                self.draw_error_screen(screen)
-            else:
-                # Fallback
-                self.draw_fallback_screen(screen)
-                
+            with self.profiler.section(f"draw_{'compose' if self.mode == 'chat_view' and self.compose_mode else self.mode}"):
+                self.draw_mode(screen)
         except Exception as e:
             # Fallback error display
+            self.damage.invalidate_all()
             screen.fill(BACKGROUND_COLOR)
             error_text = self.os.font_l.render("WhatsApp", True, ERROR_COLOR)
             screen.blit(error_text, (50, 100))
             help_text = self.os.font_s.render("Press ESC to return", True, TEXT_COLOR)
             screen.blit(help_text, (50, 140))
             print(f"WhatsApp draw error: {e}")  # Log the error for debugging
+
+    def draw_mode(self, screen):
+        """Draw the screen of the current mode"""
+        if self.mode == "splash":
+            self.draw_splash_screen(screen)
+        elif self.mode == "welcome":
+            self.draw_welcome_screen(screen)
+        elif self.mode == "loading":
+            self.draw_loading_screen(screen)
+        elif self.mode == "main_menu":
+            self.draw_main_menu(screen)
+        elif self.mode == "chat_list":
+            self.draw_chat_list(screen)
+        elif self.mode == "contact_search":
+            self.draw_contact_search(screen)
+        elif self.mode == "qr_scan":
+            self.draw_qr_scan(screen)
+        elif self.mode == "smart_sync":
+            self.draw_smart_sync(screen)
+        elif self.mode == "reset_account_info":
+            self.draw_reset_account_info(screen)
+        elif self.mode == "chat_view":
+            if self.compose_mode:
+                self.draw_compose_screen(screen)
+            else:
+                self.draw_chat_view(screen)
+        elif self.mode == "error":
+            self.draw_error_screen(screen)
+        else:
+            # Fallback
+            self.draw_fallback_screen(screen)
     
     def draw_welcome_screen(self, screen):
         """Draw welcome screen"""
@@ -1210,6 +3261,7 @@ class WhatsApp:
         title_x = (self.screen_width - title.get_width()) // 2
         screen.blit(title, (title_x, 80))
         
+        self.damage.region("content", (0, 120, self.screen_width, 60), (self.loading_dots, self.status_message))
         dots = "." * (self.loading_dots + 1)
         dots_text = self.os.font_m.render(f"Please wait{dots}", True, HIGHLIGHT_COLOR)
         dots_x = (self.screen_width - dots_text.get_width()) // 2
@@ -1234,6 +3286,7 @@ class WhatsApp:
         # Option 1: Chat List
         is_selected = (self.selected_menu_index == 0)
         option_bg = pygame.Rect(30, y-5, self.screen_width-60, 28)
+        self.damage.region("option0", option_bg, is_selected)
         if is_selected:
             pygame.draw.rect(screen, SELECTED_COLOR, option_bg)
             pygame.draw.rect(screen, ACCENT_COLOR, option_bg, 2)
@@ -1247,6 +3300,7 @@ class WhatsApp:
         # Option 2: New Chat
         is_selected = (self.selected_menu_index == 1)
         option_bg = pygame.Rect(30, y-5, self.screen_width-60, 28)
+        self.damage.region("option1", option_bg, is_selected)
         if is_selected:
             pygame.draw.rect(screen, SELECTED_COLOR, option_bg)
             pygame.draw.rect(screen, ACCENT_COLOR, option_bg, 2)
@@ -1260,6 +3314,7 @@ class WhatsApp:
         # Option 3: Smart Sync
         is_selected = (self.selected_menu_index == 2)
         option_bg = pygame.Rect(30, y-5, self.screen_width-60, 28)
+        self.damage.region("option2", option_bg, is_selected)
         if is_selected:
             pygame.draw.rect(screen, SELECTED_COLOR, option_bg)
             pygame.draw.rect(screen, ACCENT_COLOR, option_bg, 2)
@@ -1273,6 +3328,7 @@ class WhatsApp:
         # Option 4: Reset Account
         is_selected = (self.selected_menu_index == 3)
         option_bg = pygame.Rect(30, y-5, self.screen_width-60, 28)
+        self.damage.region("option3", option_bg, is_selected)
         if is_selected:
             pygame.draw.rect(screen, SELECTED_COLOR, option_bg)
             pygame.draw.rect(screen, ACCENT_COLOR, option_bg, 2)
@@ -1284,6 +3340,7 @@ class WhatsApp:
         
         
         # Status at bottom
+        self.damage.region("status", (0, self.screen_height - 30, self.screen_width, 15), self.status_message)
         if self.status_message:
             status_y = self.screen_height - 30
             status_text = self.os.font_s.render(self.status_message, True, HIGHLIGHT_COLOR)
@@ -1302,7 +3359,7 @@ class WhatsApp:
         
         # Get QR from backend
         try:
-            response = requests.get(f"{self.backend_url}/status", timeout=5)
+            response = self.backend.get("status", "/status", retries=0)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('hasQR', False):
@@ -1337,6 +3394,8 @@ class WhatsApp:
         screen.blit(title, (10, 8))
         
         y = 60
+        self.damage.region("content", (0, 40, self.screen_width, self.screen_height - 40),
+                           (self.sync_complete, self.sync_progress, self.sync_status, self.error_message))
         
         if not self.sync_complete:
             # Show progress
@@ -1478,13 +3537,7 @@ class WhatsApp:
             screen.blit(status_text, (10, status_y))
     
         # Dibujar fondo de pantalla
-        if self.background_image:
-            screen.blit(self.background_image, (0, 0))
-            overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))
-            screen.blit(overlay, (0, 0))
-        else:
-            screen.fill(BACKGROUND_COLOR)
+        self.draw_background_safely(screen)
 
     
     def draw_chat_list(self, screen):
@@ -1496,12 +3549,14 @@ class WhatsApp:
         title = self.os.font_l.render("Chat List", True, TEXT_COLOR)
         screen.blit(title, (10, 8))
         
-        count_text = self.os.font_s.render(f"({len(self.chats)})", True, TEXT_COLOR)
+        count_text = self.os.font_s.render(f"({self.chats.total})", True, TEXT_COLOR)
         screen.blit(count_text, (title.get_width() + 20, 12))
+        self.damage.region("header", (0, 0, self.screen_width, 40), self.chats.total)
         
         y = 50
         
         if not self.chats:
+            self.damage.region("empty", (0, y, self.screen_width, 80), None)
             no_chats = self.os.font_m.render("No chats available", True, WARNING_COLOR)
             no_chats_x = (self.screen_width - no_chats.get_width()) // 2
             screen.blit(no_chats, (no_chats_x, y + 40))
@@ -1522,14 +3577,16 @@ class WhatsApp:
                         pygame.draw.rect(screen, ACCENT_COLOR, sel_rect, 2)
                     
                     color = TEXT_COLOR if is_selected else HIGHLIGHT_COLOR
-                    chat_name = str(chat.get("name", "Unknown"))[:30]
+                    chat_name = (chat.name or "Unknown")[:30]
                     
-                    unread = chat.get("unreadCount", 0)
+                    unread = chat.unread_count
                     if unread > 0:
                         chat_name += f" ({unread})"
                     
                     text = self.os.font_s.render(f"{i+1:2d}. {chat_name}", True, color)
                     screen.blit(text, (15, y))
+                    self.damage.region(f"row{i - start_idx}", (0, y - 3, self.screen_width, 26),
+                                       (i, chat_name, is_selected))
                     
                     y += 25
                     
@@ -1541,6 +3598,7 @@ class WhatsApp:
         inst_text = self.os.font_tiny.render(instructions, True, (150, 150, 150))
         screen.blit(inst_text, (10, inst_y))
         
+        self.damage.region("error", (10, inst_y - 20, self.screen_width - 20, 15), self.error_message[:45])
         if self.error_message:
             error_rect = pygame.Rect(10, inst_y - 20, self.screen_width - 20, 15)
             pygame.draw.rect(screen, ERROR_COLOR, error_rect)
@@ -1557,11 +3615,14 @@ class WhatsApp:
         
         count_text = self.os.font_s.render(f"({len(self.contacts)})", True, TEXT_COLOR)
         screen.blit(count_text, (title.get_width() + 20, 12))
+        self.damage.region("header", (0, 0, self.screen_width, 40), len(self.contacts))
         
         y = 50
         
         # Search input box
         input_rect = pygame.Rect(15, y, self.screen_width - 30, 30)
+        cursor_on = bool(self.search_input) and time.time() % 1 < 0.5
+        self.damage.region("input", input_rect, (self.search_input, cursor_on))
         pygame.draw.rect(screen, (40, 40, 50), input_rect)
         pygame.draw.rect(screen, (34, 139, 34), input_rect, 2)  # Green border
         
@@ -1579,6 +3640,12 @@ class WhatsApp:
         y += 40
         
         # Search results
+        shown = ()
+        if self.search_input and self.search_results:
+            first = max(0, min(self.selected_contact_index - 2, len(self.search_results) - 5))
+            shown = tuple(id(c) for c in self.search_results[first:first + 5])
+        self.damage.region("results", (0, y, self.screen_width, self.screen_height - y),
+                           (bool(self.search_input), len(self.search_results), self.selected_contact_index, shown))
         if self.search_input and self.search_results:
             results_title = self.os.font_s.render(f"Results ({len(self.search_results)}):", True, HIGHLIGHT_COLOR)
             screen.blit(results_title, (15, y))
@@ -1602,7 +3669,7 @@ class WhatsApp:
                         pygame.draw.rect(screen, SUCCESS_COLOR, sel_rect, 2)  # Green border
                     
                     color = TEXT_COLOR if is_selected else HIGHLIGHT_COLOR
-                    contact_name = str(contact.get("name", "Unknown"))[:35]
+                    contact_name = (contact.name or "Unknown")[:35]
                     
                     text = self.os.font_s.render(f"{i+1:2d}. {contact_name}", True, color)
                     screen.blit(text, (15, y))
@@ -1630,11 +3697,27 @@ class WhatsApp:
         inst_text = self.os.font_tiny.render(instructions, True, (150, 150, 150))
         screen.blit(inst_text, (10, inst_y))
         
+        self.damage.region("error", (10, inst_y - 20, self.screen_width - 20, 15), self.error_message[:45])
         if self.error_message:
             error_rect = pygame.Rect(10, inst_y - 20, self.screen_width - 20, 15)
             pygame.draw.rect(screen, ERROR_COLOR, error_rect)
             error_text = self.os.font_tiny.render(self.error_message[:45], True, TEXT_COLOR)
             screen.blit(error_text, (12, inst_y - 18))
+    def message_lines(self, message, max_width):
+        """Wrapped display lines and color for a message (cached per message id, text and width)"""
+        from_me = message.from_me
+        color = SUCCESS_COLOR if from_me else HIGHLIGHT_COLOR
+
+        message_id = message.id
+
+        def build_text():
+            prefix = "You: " if from_me else f"{self.get_participant_name(message)}: "
+            return prefix + self.filter_text_only(message.body, message_id)
+
+        message_key = message_id or id(message)
+        lines = self.layout_cache.wrap(message_key, message.body, self.os.font_s, max_width, build_text)
+        return lines, color
+
     def draw_chat_view(self, screen):
         """Draw chat view with all messages and proper scrolling"""
         if not self.current_chat:
@@ -1644,92 +3727,91 @@ class WhatsApp:
 
         # Header
         pygame.draw.rect(screen, (34, 139, 34), (0, 0, self.screen_width, 40))
-        chat_name = str(self.current_chat.get("name", "Unknown"))[:20]
+        chat_name = (self.current_chat.name or "Unknown")[:20]
         title = self.os.font_m.render(chat_name, True, TEXT_COLOR)
         screen.blit(title, (10, 10))
 
         if hasattr(self, '_came_from_search') and self._came_from_search:
             indicator = self.os.font_tiny.render("New Chat", True, (150, 255, 150))
             screen.blit(indicator, (self.screen_width - 60, 15))
+        self.damage.region("header", (0, 0, self.screen_width, 40),
+                           (chat_name, getattr(self, '_came_from_search', False)))
 
         # Message display area - adjusted to not overlap with input area
         messages_start_y = 50
         messages_end_y = 170  # Leave space for input area
         line_height = 18
+        messages = self.current_messages
 
+        scroll_info = ""
         if not self.current_messages:
             no_msg = self.os.font_m.render("No messages", True, HIGHLIGHT_COLOR)
             no_msg_x = (self.screen_width - no_msg.get_width()) // 2
             screen.blit(no_msg, (no_msg_x, messages_start_y + 40))
         else:
-            # Calculate how many lines we can show
             available_height = messages_end_y - messages_start_y
-            max_lines = available_height // line_height
-            
-            # Start from the end of messages (newest first) minus scroll offset
-            total_messages = len(self.current_messages)
-            if total_messages == 0:
-                return
-            
-            # Calculate starting message index based on scroll
-            start_msg_index = max(0, total_messages - max_lines + self.message_scroll)
-            end_msg_index = min(total_messages, start_msg_index + max_lines)
-            
-            y = messages_start_y
-            messages_to_show = self.current_messages[start_msg_index:end_msg_index]
-            
-            for message in messages_to_show:
-                if y >= messages_end_y - line_height:
+            max_width = self.screen_width - 30
+            font = self.os.font_s
+            gap = 3  # Small gap between messages
+
+            # Message tops in content coordinates - only rebuilt when messages, width or font change.
+            # Messages never drawn get estimated heights; only the visible ones are wrapped
+            total_messages = len(messages)
+            signature = (total_messages, id(messages[0]), id(messages[-1]), max_width, id(font))
+            layout = self.layout_cache
+            estimated_heights = lambda: (
+                layout.line_count(m.id or id(m), m.body, font, max_width) * line_height + gap for m in messages)
+
+            for _ in range(3):
+                offsets = layout.offsets(signature, estimated_heights)
+                content_height = offsets[-1]
+
+                # message_scroll counts lines scrolled up from the newest message
+                overflow = max(0, content_height - available_height)
+                self._max_message_scroll = -(-overflow // line_height)
+                scroll = min(self.message_scroll, self._max_message_scroll)
+                view_top = max(0, overflow - scroll * line_height)
+                first = max(0, bisect.bisect_right(offsets, view_top) - 1)
+
+                # Wrap the visible window; if an estimate was off the window moved, so look again
+                settled = True
+                index = first
+                while index < total_messages and offsets[index] - view_top < available_height:
+                    try:
+                        lines, _ = self.message_lines(messages[index], max_width)
+                        settled &= not layout.settle(index, len(lines) * line_height + gap)
+                    except Exception as e:
+                        print(f"Error wrapping message: {e}")
+                    index += 1
+                if settled:
                     break
-                
+
+            last = first
+            for index in range(first, total_messages):
+                y = messages_start_y + offsets[index] - view_top
+                if y >= messages_end_y:
+                    break
+                last = index
                 try:
-                    body = self.filter_text_only(message.get("body", ""))
-                    
-                    if message.get("fromMe", False):
-                        color = SUCCESS_COLOR
-                        prefix = "You: "
-                    else:
-                        color = HIGHLIGHT_COLOR
-                        participant_name = self.get_participant_name(message)
-                        prefix = f"{participant_name}: "
-                    
-                    # Word wrap the message to fit screen
-                    full_text = prefix + body
-                    max_width = self.screen_width - 30
-                    
-                    # Simple word wrapping
-                    words = full_text.split()
-                    lines = []
-                    current_line = ""
-                    
-                    for word in words:
-                        test_line = f"{current_line} {word}".strip()
-                        text_width = self.os.font_s.size(test_line)[0]
-                        
-                        if text_width <= max_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                            current_line = word
-                    
-                    if current_line:
-                        lines.append(current_line)
-                    
-                    # Draw each line of the message
+                    lines, color = self.message_lines(messages[index], max_width)
                     for line in lines:
-                        if y >= messages_end_y - line_height:
-                            break
-                        text_surface = self.safe_render_text(line, self.os.font_s, color)
-                        screen.blit(text_surface, (15, y))
+                        if y >= messages_start_y and y + line_height <= messages_end_y:
+                            text_surface = self.safe_render_text(line, font, color)
+                            screen.blit(text_surface, (15, y))
                         y += line_height
-                    
-                    # Small gap between messages
-                    y += 3
-                    
                 except Exception as e:
                     print(f"Error rendering message: {e}")
                     continue
+
+            if overflow:
+                scroll_info = f" ({first+1}-{last+1}/{total_messages})"
+            if self.history_loading:
+                scroll_info += " ..."
+
+        # Declared after the layout pass: wraps and renames bump the layout generation
+        self.damage.region("messages", (0, messages_start_y, self.screen_width, messages_end_y - messages_start_y),
+                           (len(messages), self.message_scroll, self.layout_cache.generation,
+                            id(messages[0]) if messages else None, id(messages[-1]) if messages else None))
         
         # Input area at bottom - fixed position
         input_start_y = 175
@@ -1743,12 +3825,9 @@ class WhatsApp:
         screen.blit(prompt_text, (prompt_x, input_start_y + 15))
         
         # Instructions at bottom
-        scroll_info = ""
-        if self.current_messages and len(self.current_messages) > max_lines:
-            scroll_info = f" ({start_msg_index+1}-{end_msg_index}/{total_messages})"
-        
         inst_text = self.os.font_tiny.render(f"↑↓ Scroll{scroll_info}  Enter: Compose  ESC: Back", True, (150, 150, 150))
         screen.blit(inst_text, (10, self.screen_height - 12))
+        self.damage.region("footer", (0, self.screen_height - 14, self.screen_width, 14), scroll_info)
     def draw_compose_screen(self, screen):
         """Draw message composition with larger text"""
         if not self.current_chat:
@@ -1756,10 +3835,11 @@ class WhatsApp:
         
         pygame.draw.rect(screen, (34, 139, 34), (0, 0, self.screen_width, 40))
         
-        title = self.os.font_m.render(f"To: {str(self.current_chat.get('name', 'Unknown'))[:15]}", True, TEXT_COLOR)
+        title = self.os.font_m.render(f"To: {(self.current_chat.name or 'Unknown')[:15]}", True, TEXT_COLOR)
         screen.blit(title, (10, 10))
         
         y = 50
+        self.damage.region("recent", (0, 50, self.screen_width, 56), tuple(id(m) for m in self.current_messages[-2:]))
         if self.current_messages:
             recent_text = self.os.font_s.render("Recent:", True, HIGHLIGHT_COLOR)
             screen.blit(recent_text, (15, y))
@@ -1768,9 +3848,9 @@ class WhatsApp:
             # Show last 2 messages for context with larger font
             for message in self.current_messages[-2:]:
                 try:
-                    sender = "You" if message.get("fromMe", False) else self.get_participant_name(message)
-                    body = self.filter_text_only(message.get("body", ""))[:20]  # Reduced for larger font
-                    color = SUCCESS_COLOR if message.get("fromMe", False) else (180, 180, 180)
+                    sender = "You" if message.from_me else self.get_participant_name(message)
+                    body = self.filter_text_only(message.body, message.id)[:20]  # Reduced for larger font
+                    color = SUCCESS_COLOR if message.from_me else (180, 180, 180)
                     
                     # LARGER FONT FOR RECENT MESSAGES
                     text = self.os.font_s.render(f"{sender}: {body}", True, color)  # Changed from font_tiny
@@ -1795,6 +3875,7 @@ class WhatsApp:
         input_rect = pygame.Rect(10, input_start_y, self.screen_width - 20, input_height)
         pygame.draw.rect(screen, (30, 30, 40), input_rect)
         pygame.draw.rect(screen, ACCENT_COLOR, input_rect, 2)
+        self.damage.region("input", input_rect, (tuple(self.input_lines), time.time() % 1 < 0.5))
         
         if self.input_lines and self.input_lines[0]:
             for i, line in enumerate(self.input_lines):
@@ -1898,13 +3979,12 @@ def main():
     
     print("🚀 Starting WhatsApp with full interface...")
     print("📱 WhatsApp Module initialized")
-    print("🌐 Connecting to server at http://localhost:3333")
+    print(f"🌐 Connecting to server at {whatsapp.backend_url}")
     print("🖥️ Display mode:", display_mode)
     
     # Test server connection
     try:
-        import requests
-        response = requests.get("http://localhost:3333/status", timeout=5)
+        response = whatsapp.backend.get("status", "/status", retries=0)
         if response.status_code == 200:
             print("✅ Server connection successful")
             status = response.json()
@@ -1924,34 +4004,92 @@ def main():
     running = True
     frame_count = 0
     last_mode = ""
-    
+    scheduler = whatsapp.render_scheduler
+    profiler = whatsapp.profiler
+    last_report = time.time()
+
     try:
         while running:
+            interval = whatsapp.animation_interval()
+
+            # Idle: block until a key, a network result (WAKE_EVENT) or the next animation tick
+            if scheduler.frame_due(interval):
+                events = pygame.event.get()
+            else:
+                timeout = scheduler.wait_timeout(interval)
+                first = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+                events = [first] + pygame.event.get()
+
             # Handle events
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE and whatsapp.mode == "splash":
+                    scheduler.invalidate()
+                    if event.key == pygame.K_F12:
+                        # Perf overlay on/off
+                        profiler.toggle()
+                        whatsapp.damage.invalidate_all()
+                    elif event.key == pygame.K_ESCAPE and whatsapp.mode == "splash":
                         running = False
                     else:
-                        result = whatsapp.handle_event(event)
+                        with profiler.section("handle_event"):
+                            result = whatsapp.handle_event(event)
                         if result == "back":
                            running = False
-            
+
+            # Network results land here, between frames, never while drawing
+            whatsapp.apply_network_updates()
+
+            # Handling input may have changed the mode (and its animation rate)
+            interval = whatsapp.animation_interval()
+            if not running or not scheduler.frame_due(interval):
+                continue
+            scheduler.begin_frame(interval)
+            profiler.begin_frame()
+
             # Update WhatsApp
-            whatsapp.update()
-            
+            with profiler.section("update"):
+                whatsapp.update()
+
             # Draw everything with full interface
             screen.fill(BACKGROUND_COLOR)
             whatsapp.draw(screen)
-            
-            pygame.display.flip()
+
+            # Push only the damaged regions; full flip on screen switches
+            damaged = whatsapp.damage.end_frame()
+            if profiler.enabled:
+                overlay = profiler.draw_overlay(screen, whatsapp.os.font_tiny, whatsapp.backend.last_latency_ms)
+                if damaged is not None:
+                    damaged.append(overlay)
+            if damaged is None:
+                pygame.display.flip()
+            elif damaged:
+                pygame.display.update(damaged)
+            profiler.end_frame()
             clock.tick(60)
-            
+
+            # Render statistics
+            if time.time() - last_report >= 30:
+                last_report = time.time()
+                stats = scheduler.stats()
+                print(f"🎞️ Frames: {stats['rendered']} rendered, {stats['skipped']} skipped ({stats['skip_ratio']:.0%})")
+                for endpoint, net in sorted(whatsapp.backend.stats().items()):
+                    print(f"🌐 {endpoint}: {net['calls']} calls, {net['errors']} errors, {net['retries']} retries, "
+                          f"avg {net['avg_ms']} ms, max {net['max_ms']:.0f} ms")
+                net_jobs = whatsapp.network.stats()
+                print(f"🧵 Network jobs: {net_jobs['submitted']} submitted, {net_jobs['cancelled']} cancelled, "
+                      f"{net_jobs['dropped']} stale updates dropped, {net_jobs['failed']} failed")
+                prefetch = whatsapp.prefetcher.stats()
+                print(f"📥 Chat prefetch: {prefetch['hits']} hits, {prefetch['misses']} misses "
+                      f"({prefetch['hit_rate']:.0%}), {prefetch['fetched']} fetched, {prefetch['cancelled']} cancelled")
+                text_stats = TEXT_SURFACE_CACHE.stats()
+                print(f"🔤 Text cache: {text_stats['hits']} hits, {text_stats['misses']} misses "
+                      f"({text_stats['hit_ratio']:.0%}), {text_stats['bytes'] // 1024} KB")
+
             # Status updates
             frame_count += 1
-            if frame_count % 300 == 0:  # Every 5 seconds
+            if frame_count % 300 == 0:  # Every 300 rendered frames
                 if whatsapp.mode != last_mode:
                     print(f"📊 WhatsApp Mode: {whatsapp.mode}")
                     if whatsapp.mode == "main_menu":
@@ -1965,7 +4103,14 @@ def main():
     except KeyboardInterrupt:
         print("\n🛑 Received interrupt signal")
         running = False
-    
+
+    if profiler.enabled:
+        profiler.dump()
+        print(f"⏱️ Profile report written to {profiler.report_path}")
+    stats = scheduler.stats()
+    print(f"🎞️ Render summary: {stats['rendered']} frames rendered, {stats['skipped']} skipped "
+          f"in {stats['elapsed']}s ({stats['skip_ratio']:.0%} idle)")
+    whatsapp.cleanup()
     pygame.quit()
     print("👋 WhatsApp interface closed")
 
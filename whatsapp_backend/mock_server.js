@@ -0,0 +1,486 @@
+/**
+ * WhatsApp Backend - Mock
+ * Servidor local que imita la API HTTP de server.js sin Chromium ni teléfono,
+ * para medir el cliente (latencia, errores, carga de mensajes) de forma reproducible.
+ *
+ * Uso: node mock_server.js [--fixture whatsapp_data.json] [--latency 80] [--jitter 40]
+ *                          [--error-rate 0.05] [--body-size 60] [--incoming-rate 2] ...
+ * Cada opción también se puede pasar por entorno: MOCK_LATENCY_MS, MOCK_ERROR_RATE, etc.
+ */
+
+const http = require('http');
+const fs = require('fs');
+const crypto = require('crypto');
+
+// Configuración: --opción valor > variable de entorno > valor por defecto
+const OPTIONS = {
+    port: ['MOCK_PORT', 3333],
+    fixture: ['MOCK_FIXTURE', ''],
+    latency: ['MOCK_LATENCY_MS', 0],         // latencia base por petición (ms)
+    jitter: ['MOCK_JITTER_MS', 0],           // +/- aleatorio sobre la latencia (ms)
+    errorRate: ['MOCK_ERROR_RATE', 0],       // fracción de peticiones que responden 500
+    contacts: ['MOCK_CONTACTS', 500],
+    chats: ['MOCK_CHATS', 200],
+    messages: ['MOCK_MESSAGES', 200],        // historial por chat
+    bodySize: ['MOCK_BODY_SIZE', 40],        // longitud media del cuerpo de los mensajes
+    incomingRate: ['MOCK_INCOMING_RATE', 0], // mensajes entrantes por segundo (0 = ninguno)
+    seed: ['MOCK_SEED', 1]
+};
+
+function parseConfig(argv) {
+    const config = {};
+    for (const [key, [envName, fallback]] of Object.entries(OPTIONS)) {
+        const flag = '--' + key.replace(/[A-Z]/g, c => '-' + c.toLowerCase());
+        const index = argv.indexOf(flag);
+        const raw = index >= 0 ? argv[index + 1] : process.env[envName];
+        config[key] = raw === undefined ? fallback : (typeof fallback === 'number' ? Number(raw) : raw);
+    }
+    return config;
+}
+
+const config = parseConfig(process.argv.slice(2));
+
+// Generador pseudoaleatorio con semilla (mulberry32) para datos reproducibles
+let rngState = config.seed >>> 0;
+function random() {
+    rngState = (rngState + 0x6D2B79F5) >>> 0;
+    let t = rngState;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+}
+
+function pick(list) {
+    return list[Math.floor(random() * list.length)];
+}
+
+// ==========================================
+// DATOS: fixture (whatsapp_data.json de server.js) o sintéticos
+// ==========================================
+
+const FIRST = ['Maria', 'Jose', 'Luis', 'Ana', 'Carmen', 'Pedro', 'Lucia', 'Javier', 'Emma', 'Noah', 'Olivia', 'Liam'];
+const LAST = ['Garcia', 'Martinez', 'Lopez', 'Sanchez', 'Perez', 'Gomez', 'Smith', 'Brown', 'Wilson', 'Taylor'];
+const WORDS = ('hola que tal vamos mañana al cine a las ocho nos vemos en la puerta ok perfect ' +
+    'see you tomorrow did you get the document I sent yesterday').split(' ');
+
+let contacts = [];
+let chats = [];
+const messagesByChat = new Map();
+let messageCounter = 0;
+
+function makeBody() {
+    const target = Math.max(1, Math.round(config.bodySize * (0.5 + random())));
+    const words = [];
+    let length = 0;
+    while (length < target) {
+        const word = pick(WORDS);
+        words.push(word);
+        length += word.length + 1;
+    }
+    return words.join(' ');
+}
+
+function makeMessage(chat, timestamp, fromMe) {
+    messageCounter += 1;
+    const author = chat.isGroup ? pick(contacts).id : chat.id;
+    return {
+        id: `${fromMe ? 'true' : 'false'}_${chat.id}_MOCK${messageCounter.toString(16).toUpperCase()}`,
+        body: makeBody(),
+        fromMe,
+        timestamp,
+        from: fromMe ? 'me@c.us' : author,
+        to: fromMe ? chat.id : 'me@c.us',
+        type: 'chat',
+        author: fromMe ? 'me@c.us' : author
+    };
+}
+
+function generateData() {
+    const now = Math.floor(Date.now() / 1000);
+    for (let i = 0; i < config.contacts; i++) {
+        const number = String(34600000000 + i);
+        contacts.push({
+            id: `${number}@c.us`,
+            name: `${pick(FIRST)} ${pick(LAST)}`,
+            number,
+            isGroup: false,
+            isMyContact: true
+        });
+    }
+    for (let i = 0; i < config.chats; i++) {
+        const isGroup = i % 7 === 0 || contacts.length === 0;
+        const contact = contacts[i % Math.max(contacts.length, 1)];
+        chats.push({
+            id: isGroup ? `1203630${String(i).padStart(8, '0')}@g.us` : contact.id,
+            name: isGroup ? `Grupo ${pick(WORDS)} ${i}` : contact.name,
+            isGroup,
+            unreadCount: random() < 0.2 ? Math.floor(random() * 12) : 0,
+            lastMessage: { body: makeBody(), timestamp: now - i * 600, from: contact ? contact.id : 'me@c.us' }
+        });
+    }
+    // Los ids de chats individuales se repiten si hay más chats que contactos
+    const seen = new Set();
+    chats = chats.filter(chat => !seen.has(chat.id) && seen.add(chat.id));
+}
+
+function loadFixture(file) {
+    const data = JSON.parse(fs.readFileSync(file, 'utf8'));
+    contacts = data.contacts || [];
+    chats = data.chats || [];
+    for (const [chatId, list] of Object.entries(data.messages || {})) {
+        messagesByChat.set(chatId, list.slice().sort((a, b) => a.timestamp - b.timestamp));
+    }
+}
+
+// Historial de un chat, generado la primera vez que se pide
+function chatMessages(chat) {
+    let list = messagesByChat.get(chat.id);
+    if (!list) {
+        const newest = chatActivity(chat) || Math.floor(Date.now() / 1000);
+        list = [];
+        for (let i = config.messages - 1; i >= 0; i--) {
+            list.push(makeMessage(chat, newest - i * 90, random() < 0.4));
+        }
+        if (chat.lastMessage && list.length) {
+            list[list.length - 1].body = chat.lastMessage.body;
+        }
+        messagesByChat.set(chat.id, list);
+    }
+    return list;
+}
+
+// ==========================================
+// SYNC INCREMENTAL Y PAGINACIÓN (mismo protocolo que server.js)
+// ==========================================
+
+const serverEpoch = 'mock' + crypto.randomBytes(2).toString('hex');
+const deltaState = {
+    chats: { version: 1, entries: new Map() },
+    contacts: { version: 1, entries: new Map() }
+};
+
+function touch(kind, id) {
+    const state = deltaState[kind];
+    state.version += 1;
+    state.entries.set(id, state.version);
+}
+
+function deltaCursor(kind) {
+    return `${serverEpoch}:${deltaState[kind].version}`;
+}
+
+function sendDelta(req, res, query, kind, list, variant = '', fallback = null) {
+    const state = deltaState[kind];
+    const cursor = deltaCursor(kind);
+    const etag = `W/"${kind}${variant}-${cursor}"`;
+
+    if (req.headers['if-none-match'] === etag) {
+        return send(res, 304, null, { ETag: etag });
+    }
+
+    const [epoch, sinceRaw] = String(query.get('since') || '').split(':');
+    const since = parseInt(sinceRaw, 10);
+    if (epoch === serverEpoch && !isNaN(since) && since <= state.version) {
+        const changed = list.filter(entry => (state.entries.get(entry.id) || 1) > since);
+        return send(res, 200, { success: true, delta: true, version: cursor, total: list.length, [kind]: changed, removed: [] },
+            { ETag: etag });
+    }
+    if (fallback) {
+        return fallback();  // cursor caducado con limit: primera página, sin ETag de la lista
+    }
+    send(res, 200, { success: true, delta: false, version: cursor, total: list.length, [kind]: list }, { ETag: etag });
+}
+
+const MAX_CHAT_PAGE = 200;
+
+function chatActivity(chat) {
+    return (chat.lastMessage && chat.lastMessage.timestamp) || 0;
+}
+
+function compareChats(a, b) {
+    return chatActivity(b) - chatActivity(a) || (a.id < b.id ? -1 : a.id > b.id ? 1 : 0);
+}
+
+function encodeChatCursor(chat) {
+    return Buffer.from(`${chatActivity(chat)}:${chat.id}`).toString('base64url');
+}
+
+function decodeChatCursor(cursor) {
+    const raw = Buffer.from(String(cursor), 'base64url').toString('utf8');
+    const sep = raw.indexOf(':');
+    const timestamp = parseInt(raw.slice(0, sep), 10);
+    if (sep < 0 || isNaN(timestamp)) return null;
+    return { id: raw.slice(sep + 1), lastMessage: { timestamp } };
+}
+
+function sendChatPage(res, query, list) {
+    const limit = Math.min(Math.max(parseInt(query.get('limit'), 10) || 20, 1), MAX_CHAT_PAGE);
+    const sorted = list.slice().sort(compareChats);
+
+    let start = 0;
+    if (query.get('cursor')) {
+        const after = decodeChatCursor(query.get('cursor'));
+        if (!after) {
+            return send(res, 400, { success: false, error: 'Invalid cursor' });
+        }
+        let lo = 0, hi = sorted.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (compareChats(sorted[mid], after) <= 0) lo = mid + 1; else hi = mid;
+        }
+        start = lo;
+    }
+
+    const page = sorted.slice(start, start + limit);
+    const hasMore = start + limit < sorted.length;
+    send(res, 200, {
+        success: true,
+        chats: page,
+        nextCursor: hasMore && page.length ? encodeChatCursor(page[page.length - 1]) : null,
+        total: sorted.length,
+        version: deltaCursor('chats')
+    });
+}
+
+// ==========================================
+// MENSAJES ENTRANTES Y STREAM DE EVENTOS
+// ==========================================
+
+const eventStreams = new Set();
+const stats = { requests: {}, injectedErrors: 0, generated: 0, sent: 0, startedAt: Date.now() };
+
+function broadcastEvent(type, payload) {
+    const frame = `event: ${type}\ndata: ${JSON.stringify(payload)}\n\n`;
+    for (const res of eventStreams) {
+        res.write(frame);
+    }
+}
+
+function addMessage(chat, msg) {
+    chatMessages(chat).push(msg);
+    chat.lastMessage = { body: msg.body, timestamp: msg.timestamp, from: msg.from };
+    if (!msg.fromMe) chat.unreadCount = (chat.unreadCount || 0) + 1;
+    touch('chats', chat.id);
+    broadcastEvent('message', { chatId: chat.id, message: msg });
+}
+
+// Los chats más recientes reciben más mensajes (como en un uso real)
+function generateIncoming() {
+    if (chats.length === 0) return;
+    const sorted = chats.slice().sort(compareChats);
+    const chat = sorted[Math.floor(Math.pow(random(), 2) * sorted.length)];
+    addMessage(chat, makeMessage(chat, Math.floor(Date.now() / 1000), false));
+    stats.generated += 1;
+}
+
+// ==========================================
+// HTTP
+// ==========================================
+
+function send(res, status, body, headers = {}) {
+    const payload = body === null ? '' : JSON.stringify(body);
+    // Como res.json() de Express: el cliente calcula el progreso de descarga con Content-Length
+    res.writeHead(status, Object.assign({ 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(payload) }, headers));
+    res.end(payload);
+}
+
+function readJson(req) {
+    return new Promise(resolve => {
+        let raw = '';
+        req.on('data', chunk => { raw += chunk; });
+        req.on('end', () => {
+            try {
+                resolve(JSON.parse(raw || '{}'));
+            } catch (error) {
+                resolve({});
+            }
+        });
+    });
+}
+
+function findChat(chatId) {
+    return chats.find(chat => chat.id === chatId);
+}
+
+function formatChat(chat) {
+    return { id: chat.id, name: chat.name, isGroup: chat.isGroup, unreadCount: chat.unreadCount || 0, lastMessage: chat.lastMessage };
+}
+
+const routes = [
+    ['GET', /^\/status$/, (req, res) => send(res, 200, {
+        ready: true,
+        authenticated: true,
+        status: 'READY',
+        hasQR: false,
+        qr: '',
+        contactsCount: contacts.length,
+        chatsCount: chats.length,
+        lastSync: new Date(stats.startedAt).toISOString(),
+        session: { exists: true, valid: true },
+        version: 'mock'
+    })],
+
+    ['GET', /^\/capabilities$/, (req, res) => send(res, 200, {
+        success: true,
+        version: 'mock',
+        api: 1,
+        endpoints: {
+            status: 'GET /status',
+            stats: 'GET /stats',
+            contacts: 'GET /contacts',
+            chats: 'GET /chats',
+            chat: 'GET /chat/:id',
+            messages: 'GET /chat/:id/messages',
+            send: 'POST /send-message',
+            events: 'GET /events'
+        },
+        features: { deltaSync: true, chatPages: true, chatIncludesMessages: true, historyBefore: true }
+    })],
+
+    ['GET', /^\/contacts$/, (req, res, query) => sendDelta(req, res, query, 'contacts', contacts)],
+
+    ['GET', /^\/chats$/, (req, res, query) => {
+        const includeGroups = (query.get('groups') || 'true') === 'true';
+        const list = includeGroups ? chats : chats.filter(chat => !chat.isGroup);
+        const paged = query.get('limit') !== null;
+        if (paged && query.get('since') === null) {
+            return sendChatPage(res, query, list);
+        }
+        sendDelta(req, res, query, 'chats', list, includeGroups ? '' : '-nogroups',
+            paged ? () => sendChatPage(res, query, list) : null);
+    }],
+
+    ['GET', /^\/chat\/([^/]+)\/messages$/, (req, res, query, chatId) => {
+        const chat = findChat(chatId);
+        if (!chat) {
+            return send(res, 404, { success: false, error: 'Chat not found or messages unavailable', chatId });
+        }
+        const list = chatMessages(chat);
+        const pageSize = Math.max(parseInt(query.get('limit'), 10) || 30, 1);
+        let end = list.length;
+        if (query.get('before')) {
+            end = list.findIndex(msg => msg.id === query.get('before'));
+            if (end < 0) end = 0;
+        }
+        const start = Math.max(0, end - pageSize);
+        const messages = list.slice(start, end);
+        send(res, 200, {
+            success: true,
+            chat: formatChat(chat),
+            messages,
+            messageCount: messages.length,
+            hasMore: start > 0,
+            timestamp: Date.now()
+        });
+    }],
+
+    ['GET', /^\/chat\/([^/]+)$/, (req, res, query, chatId) => {
+        const chat = findChat(chatId);
+        if (!chat) {
+            return send(res, 404, { success: false, error: 'Chat not found' });
+        }
+        const limit = parseInt(query.get('limit'), 10) || 20;
+        const messages = query.get('includeMessages') === 'false' ? [] : chatMessages(chat).slice(-limit);
+        send(res, 200, { success: true, chat: formatChat(chat), messages, messageCount: messages.length, hasMessages: messages.length > 0 });
+    }],
+
+    ['POST', /^\/send-message$/, async (req, res) => {
+        const { to, message } = await readJson(req);
+        const chat = findChat(to);
+        if (!chat || !message) {
+            return send(res, 500, { success: false, error: 'Invalid recipient or message' });
+        }
+        const msg = makeMessage(chat, Math.floor(Date.now() / 1000), true);
+        msg.body = message;
+        addMessage(chat, msg);
+        stats.sent += 1;
+        send(res, 200, { success: true, messageId: msg.id, timestamp: Date.now() });
+    }],
+
+    ['GET', /^\/events$/, (req, res) => {
+        res.writeHead(200, {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive'
+        });
+        res.write(`retry: 3000\nevent: hello\ndata: ${JSON.stringify({ ready: true })}\n\n`);
+        eventStreams.add(res);
+        req.on('close', () => eventStreams.delete(res));
+    }],
+
+    ['GET', /^\/stats$/, (req, res) => send(res, 200, {
+        success: true,
+        mock: true,
+        config,
+        requests: stats.requests,
+        injectedErrors: stats.injectedErrors,
+        generatedMessages: stats.generated,
+        sentMessages: stats.sent,
+        eventStreams: eventStreams.size,
+        uptime: process.uptime()
+    })]
+];
+
+// Sin latencia ni errores inyectados: el stream y las estadísticas deben seguir disponibles
+const UNTHROTTLED = new Set(['/events', '/stats']);
+
+function delay() {
+    const ms = config.latency + (random() * 2 - 1) * config.jitter;
+    return new Promise(resolve => setTimeout(resolve, Math.max(0, ms)));
+}
+
+const server = http.createServer(async (req, res) => {
+    const url = new URL(req.url, 'http://localhost');
+    const route = routes.find(([method, pattern]) => method === req.method && pattern.test(url.pathname));
+    if (!route) {
+        return send(res, 404, { success: false, error: 'Not found' });
+    }
+
+    const name = `${req.method} ${url.pathname.replace(/^\/chat\/[^/]+/, '/chat/:id')}`;
+    stats.requests[name] = (stats.requests[name] || 0) + 1;
+
+    if (!UNTHROTTLED.has(url.pathname)) {
+        await delay();
+        if (random() < config.errorRate) {
+            stats.injectedErrors += 1;
+            return send(res, 500, { success: false, error: 'Injected failure' });
+        }
+    }
+
+    const [, pattern, handler] = route;
+    const params = url.pathname.match(pattern).slice(1).map(decodeURIComponent);
+    try {
+        await handler(req, res, url.searchParams, ...params);
+    } catch (error) {
+        console.log(`[MOCK] Error handling ${name}: ${error.message}`);
+        if (!res.headersSent) send(res, 500, { success: false, error: error.message });
+    }
+});
+
+if (config.fixture) {
+    loadFixture(config.fixture);
+} else {
+    generateData();
+}
+for (const contact of contacts) touch('contacts', contact.id);
+for (const chat of chats) touch('chats', chat.id);
+
+server.listen(config.port, '0.0.0.0', () => {
+    console.log(`[MOCK] WhatsApp mock backend on http://localhost:${config.port}`);
+    console.log(`[MOCK] ${contacts.length} contacts, ${chats.length} chats` +
+        (config.fixture ? ` from ${config.fixture}` : ` (seed ${config.seed})`));
+    console.log(`[MOCK] latency ${config.latency}±${config.jitter} ms, error rate ${config.errorRate}, ` +
+        `incoming ${config.incomingRate} msg/s`);
+});
+
+if (config.incomingRate > 0) {
+    setInterval(generateIncoming, 1000 / config.incomingRate);
+}
+
+// Heartbeat de los streams de eventos
+setInterval(() => {
+    for (const res of eventStreams) res.write(': ping\n\n');
+}, 25000);
+
+process.on('SIGINT', () => process.exit(0));
+process.on('SIGTERM', () => process.exit(0));
@@ -28,6 +28,20 @@ let contacts = [];
 let chats = [];
 let lastSync = null;
 
+// Clientes suscritos al stream de eventos (Server-Sent Events)
+const eventStreams = new Set();
+const EVENT_HEARTBEAT_MS = 25000;
+
+// Versionado para sincronización incremental (ETag + since=<cursor>)
+// Cada sync que cambia algo incrementa la versión; las entradas guardan la versión
+// en la que cambiaron y las eliminadas quedan como tombstones.
+const serverEpoch = crypto.randomBytes(4).toString('hex');
+const MAX_TOMBSTONES = 5000;
+const deltaState = {
+    chats: { version: 0, minVersion: 0, entries: new Map(), removed: new Map() },
+    contacts: { version: 0, minVersion: 0, entries: new Map(), removed: new Map() }
+};
+
 // Configuración de rutas de archivos
 const PATHS = {
     auth: path.join(__dirname, '.whatsapp_session'),
@@ -229,6 +243,8 @@ function loadData() {
             contacts = data.contacts || [];
             chats = data.chats || [];
             lastSync = data.lastSync || null;
+            updateDeltaState('contacts', contacts);
+            updateDeltaState('chats', chats);
             log(`Data loaded: ${contacts.length} contacts, ${chats.length} chats`);
         }
     } catch (error) {
@@ -253,6 +269,162 @@ function saveData() {
     }
 }
 
+// Registrar cambios de una lista (chats o contactos) en el estado de versiones
+function updateDeltaState(kind, list) {
+    const state = deltaState[kind];
+    const nextVersion = state.version + 1;
+    const seen = new Set();
+    let changed = false;
+
+    for (const entry of list) {
+        seen.add(entry.id);
+        const hash = crypto.createHash('sha1').update(JSON.stringify(entry)).digest('base64');
+        const known = state.entries.get(entry.id);
+        if (!known || known.hash !== hash) {
+            state.entries.set(entry.id, { version: nextVersion, hash });
+            state.removed.delete(entry.id);
+            changed = true;
+        }
+    }
+
+    for (const id of Array.from(state.entries.keys())) {
+        if (!seen.has(id)) {
+            state.entries.delete(id);
+            state.removed.set(id, nextVersion);
+            changed = true;
+        }
+    }
+
+    if (changed) {
+        state.version = nextVersion;
+        if (state.removed.size > MAX_TOMBSTONES) {
+            // Clientes con un cursor anterior recibirán la lista completa
+            state.removed.clear();
+            state.minVersion = state.version;
+        }
+    }
+}
+
+function deltaCursor(kind) {
+    return `${serverEpoch}:${deltaState[kind].version}`;
+}
+
+// Responder con 304, con un delta desde ?since=<cursor> o con la lista completa
+// fallback: respuesta si el cursor ya no vale (p. ej. primera página en vez de la lista completa)
+function sendDelta(req, res, kind, list, variant = '', fallback = null) {
+    const state = deltaState[kind];
+    const cursor = deltaCursor(kind);
+    const etag = `W/"${kind}${variant}-${cursor}"`;
+    res.set('ETag', etag);
+
+    if (req.get('If-None-Match') === etag) {
+        return res.status(304).end();
+    }
+
+    const [epoch, sinceRaw] = String(req.query.since || '').split(':');
+    const since = parseInt(sinceRaw, 10);
+    if (epoch === serverEpoch && !isNaN(since) && since >= state.minVersion && since <= state.version) {
+        const changed = list.filter(entry => {
+            const known = state.entries.get(entry.id);
+            return known && known.version > since;
+        });
+        const removed = [];
+        for (const [id, version] of state.removed) {
+            if (version > since) removed.push(id);
+        }
+        return res.json({ success: true, delta: true, version: cursor, total: list.length, [kind]: changed, removed });
+    }
+
+    if (fallback) {
+        res.removeHeader('ETag');  // ETag de la lista completa, no de una página
+        return fallback();
+    }
+    res.json({ success: true, delta: false, version: cursor, total: list.length, [kind]: list });
+}
+
+// Paginación keyset de chats: orden por última actividad (desc) y id (asc)
+const MAX_CHAT_PAGE = 200;
+
+function chatActivity(chat) {
+    return (chat.lastMessage && chat.lastMessage.timestamp) || 0;
+}
+
+function compareChats(a, b) {
+    return chatActivity(b) - chatActivity(a) || (a.id < b.id ? -1 : a.id > b.id ? 1 : 0);
+}
+
+function encodeChatCursor(chat) {
+    return Buffer.from(`${chatActivity(chat)}:${chat.id}`).toString('base64url');
+}
+
+function decodeChatCursor(cursor) {
+    const raw = Buffer.from(String(cursor), 'base64url').toString('utf8');
+    const sep = raw.indexOf(':');
+    const timestamp = parseInt(raw.slice(0, sep), 10);
+    if (sep < 0 || isNaN(timestamp)) return null;
+    return { id: raw.slice(sep + 1), lastMessage: { timestamp } };
+}
+
+// Una página de chats después de ?cursor= (estable aunque cambie la lista entre páginas)
+function sendChatPage(req, res, list) {
+    const limit = Math.min(Math.max(parseInt(req.query.limit, 10) || 20, 1), MAX_CHAT_PAGE);
+    const sorted = list.slice().sort(compareChats);
+
+    let start = 0;
+    if (req.query.cursor) {
+        const after = decodeChatCursor(req.query.cursor);
+        if (!after) {
+            return res.status(400).json({ success: false, error: 'Invalid cursor' });
+        }
+        // Primera posición estrictamente posterior al cursor (búsqueda binaria)
+        let lo = 0, hi = sorted.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (compareChats(sorted[mid], after) <= 0) lo = mid + 1; else hi = mid;
+        }
+        start = lo;
+    }
+
+    const page = sorted.slice(start, start + limit);
+    const hasMore = start + limit < sorted.length;
+    res.json({
+        success: true,
+        chats: page,
+        nextCursor: hasMore && page.length ? encodeChatCursor(page[page.length - 1]) : null,
+        total: sorted.length,
+        version: deltaCursor('chats')
+    });
+}
+
+// Formato común de mensajes para la API
+function formatMessage(msg) {
+    return {
+        id: msg.id._serialized,
+        body: msg.body || '',
+        fromMe: msg.fromMe,
+        timestamp: msg.timestamp,
+        from: msg.from,
+        to: msg.to,
+        type: msg.type,
+        author: msg.author || msg.from
+    };
+}
+
+// Enviar un evento a todos los clientes del stream
+function broadcastEvent(type, payload) {
+    if (eventStreams.size === 0) return;
+
+    const frame = `event: ${type}\ndata: ${JSON.stringify(payload)}\n\n`;
+    for (const res of eventStreams) {
+        try {
+            res.write(frame);
+        } catch (error) {
+            log(`Dropping event stream: ${error.message}`, 'WARN');
+            eventStreams.delete(res);
+        }
+    }
+}
+
 // Filtrado de contactos mejorado
 function filterValidContacts(rawContacts) {
     if (!Array.isArray(rawContacts)) {
@@ -282,11 +454,82 @@ function filterValidContacts(rawContacts) {
     });
 }
 
+// Single-flight + TTL para las sincronizaciones vía Puppeteer:
+// las peticiones concurrentes comparten la misma llamada y, mientras los datos
+// estén frescos (SYNC_TTL_MS, invalidados por eventos del cliente), no se repite.
+const SYNC_TTL_MS = parseInt(process.env.SYNC_TTL_MS || '30000', 10);
+
+class SyncCoalescer {
+    constructor(name, fetchFn, ttlMs) {
+        this.name = name;
+        this.fetchFn = fetchFn;
+        this.ttlMs = ttlMs;
+        this.inFlight = null;
+        this.freshUntil = 0;
+        this.generation = 0;
+        this.lastResult = null;
+        this.lastInvalidation = null;
+        this.stats = { requests: 0, puppeteerCalls: 0, coalesced: 0, cacheHits: 0, invalidations: 0, errors: 0 };
+    }
+
+    run({ force = false } = {}) {
+        this.stats.requests++;
+        if (this.inFlight) {
+            this.stats.coalesced++;
+            return this.inFlight;
+        }
+        if (!force && this.lastResult && Date.now() < this.freshUntil) {
+            this.stats.cacheHits++;
+            return Promise.resolve(this.lastResult);
+        }
+
+        const generation = this.generation;
+        this.inFlight = this.fetchFn()
+            .then(({ result, fetched }) => {
+                if (fetched) {
+                    this.stats.puppeteerCalls++;
+                    // Un evento durante la llamada deja el resultado sin marcar como fresco
+                    if (generation === this.generation) {
+                        this.freshUntil = Date.now() + this.ttlMs;
+                    }
+                }
+                this.lastResult = result;
+                return result;
+            })
+            .catch(error => {
+                this.stats.errors++;
+                throw error;
+            })
+            .finally(() => {
+                this.inFlight = null;
+            });
+        return this.inFlight;
+    }
+
+    invalidate(reason) {
+        this.freshUntil = 0;
+        this.generation++;
+        this.stats.invalidations++;
+        this.lastInvalidation = reason;
+    }
+
+    getStats() {
+        return {
+            ...this.stats,
+            saved: this.stats.coalesced + this.stats.cacheHits,
+            ttlMs: this.ttlMs,
+            fresh: Date.now() < this.freshUntil,
+            lastInvalidation: this.lastInvalidation,
+            inFlight: !!this.inFlight
+        };
+    }
+}
+
 // Sincronización de contactos corregida
-async function syncContacts() {
+async function fetchContacts() {
     if (!client || !isReady) {
         log('Cannot sync contacts - client not ready', 'WARN');
-        return contacts;
+        return { result: contacts, fetched: false };
     }
 
     try {
@@ -295,7 +538,7 @@ async function syncContacts() {
         
         if (!rawContacts) {
             log('No contacts received from client', 'WARN');
-            return contacts;
+            return { result: contacts, fetched: false };
         }
         
         const validContacts = filterValidContacts(rawContacts);
@@ -320,21 +563,22 @@ async function syncContacts() {
         });
 
         contacts = Array.from(contactMap.values()).sort((a, b) => a.name.localeCompare(b.name));
+        updateDeltaState('contacts', contacts);
         
         log(`Contact sync completed: ${rawContacts.length} -> ${contacts.length} valid contacts`);
         saveData();
-        return contacts;
+        return { result: contacts, fetched: true };
     } catch (error) {
         log(`Error syncing contacts: ${error.message}`, 'ERROR');
-        return contacts;
+        throw error;
     }
 }
 
 // Sincronización de chats corregida
-async function syncChats() {
+async function fetchChats() {
     if (!client || !isReady) {
         log('Cannot sync chats - client not ready', 'WARN');
-        return chats;
+        return { result: chats, fetched: false };
     }
 
     try {
@@ -343,7 +587,7 @@ async function syncChats() {
         
         if (!rawChats) {
             log('No chats received from client', 'WARN');
-            return chats;
+            return { result: chats, fetched: false };
         }
         
         chats = [];
@@ -367,16 +611,29 @@ async function syncChats() {
             }
         }
 
+        updateDeltaState('chats', chats);
         lastSync = new Date().toISOString();
         log(`Chat sync completed: ${chats.length} chats`);
         saveData();
-        return chats;
+        return { result: chats, fetched: true };
     } catch (error) {
         log(`Error syncing chats: ${error.message}`, 'ERROR');
-        return chats;
+        throw error;
     }
 }
 
+const contactsSync = new SyncCoalescer('contacts', fetchContacts, SYNC_TTL_MS);
+const chatsSync = new SyncCoalescer('chats', fetchChats, SYNC_TTL_MS);
+
+// Nunca rechazan: ante un error devuelven los datos en memoria
+function syncContacts(options) {
+    return contactsSync.run(options).catch(() => contacts);
+}
+
+function syncChats(options) {
+    return chatsSync.run(options).catch(() => chats);
+}
+
 // Inicialización del cliente WhatsApp corregida
 async function initializeWhatsAppClient() {
     if (isInitializing) {
@@ -488,11 +745,14 @@ async function initializeWhatsAppClient() {
                 initializationTimeout = null;
             }
 
+            contactsSync.invalidate('ready');
+            chatsSync.invalidate('ready');
+
             // Sincronización inicial con delay
             setTimeout(async () => {
                 try {
-                    await syncContacts();
-                    await syncChats();
+                    await syncContacts({ force: true });
+                    await syncChats({ force: true });
                     log('Initial synchronization completed');
                 } catch (syncError) {
                     log(`Initial sync error: ${syncError.message}`, 'ERROR');
@@ -522,6 +782,8 @@ async function initializeWhatsAppClient() {
         client.on('disconnected', (reason) => {
             log(`WhatsApp disconnected: ${reason}`, 'WARN');
             isReady = false;
+            contactsSync.invalidate('disconnected');
+            chatsSync.invalidate('disconnected');
             isAuthenticated = false;
             connectionStatus = 'DISCONNECTED';
             isInitializing = false;
@@ -540,6 +802,28 @@ async function initializeWhatsAppClient() {
             }
         });
 
+        // Mensajes nuevos (entrantes y enviados desde el teléfono) -> stream de eventos
+        client.on('message_create', (msg) => {
+            chatsSync.invalidate('message');
+            try {
+                const chatId = msg.fromMe ? msg.to : msg.from;
+                broadcastEvent('message', { chatId, message: formatMessage(msg) });
+            } catch (error) {
+                log(`Error broadcasting message: ${error.message}`, 'WARN');
+            }
+        });
+
+        // Invalidación por eventos: la siguiente petición vuelve a consultar Puppeteer
+        ['message_revoke_everyone', 'unread_count', 'chat_removed', 'chat_archived',
+         'group_join', 'group_leave', 'group_update'].forEach(eventName => {
+            client.on(eventName, () => chatsSync.invalidate(eventName));
+        });
+
+        client.on('contact_changed', () => {
+            contactsSync.invalidate('contact_changed');
+            chatsSync.invalidate('contact_changed');
+        });
+
         client.on('change_state', (state) => {
             log(`Connection state changed: ${state}`);
         });
@@ -625,15 +909,52 @@ app.get('/status', (req, res) => {
     });
 });
 
+// Estadísticas de sincronización (llamadas a Puppeteer ahorradas por coalescencia/TTL)
+app.get('/stats', (req, res) => {
+    res.json({
+        success: true,
+        sync: {
+            contacts: contactsSync.getStats(),
+            chats: chatsSync.getStats()
+        },
+        eventStreams: eventStreams.size,
+        uptime: process.uptime()
+    });
+});
+
+// Manifiesto de la API: el cliente lo consulta una vez por conexión y va directo
+// al mejor endpoint en lugar de probar varios y pagar un round trip por cada fallo
+const CAPABILITIES = {
+    api: 1,
+    endpoints: {
+        status: 'GET /status',
+        stats: 'GET /stats',
+        contacts: 'GET /contacts',
+        chats: 'GET /chats',
+        chat: 'GET /chat/:id',
+        messages: 'GET /chat/:id/messages',
+        send: 'POST /send-message',
+        events: 'GET /events'
+    },
+    features: {
+        deltaSync: true,          // ?since=<cursor> + ETag en /contacts y /chats
+        chatPages: true,          // ?limit=&cursor= en /chats
+        chatIncludesMessages: true,
+        historyBefore: true       // ?before=<messageId> + hasMore en /chat/:id/messages
+    }
+};
+
+app.get('/capabilities', (req, res) => {
+    res.json(Object.assign({ success: true, version: '1.2.1-fixed' }, CAPABILITIES));
+});
+
 // API Contactos
 app.get('/contacts', async (req, res) => {
     try {
-        if (isReady) {
-            const freshContacts = await syncContacts();
-            res.json({ success: true, contacts: freshContacts });
-        } else {
-            res.json({ success: true, contacts: contacts, cached: true });
-        }
+        // Admite If-None-Match (304) y ?since=<cursor> (solo cambios)
+        const contactList = isReady ? await syncContacts() : contacts;
+        if (!isReady) res.set('X-Cached', 'true');
+        sendDelta(req, res, 'contacts', contactList);
     } catch (error) {
         log(`Error getting contacts: ${error.message}`, 'ERROR');
         res.status(500).json({ success: false, error: error.message });
@@ -652,13 +973,41 @@ app.get('/chats', async (req, res) => {
         }
         
         const filteredChats = includeGroups ? chatList : chatList.filter(chat => !chat.isGroup);
-        res.json({ success: true, chats: filteredChats });
+        // ?limit=N[&cursor=...] -> paginado por última actividad
+        const paged = req.query.limit !== undefined;
+        if (paged && req.query.since === undefined) {
+            return sendChatPage(req, res, filteredChats);
+        }
+        // Admite If-None-Match (304) y ?since=<cursor> (solo cambios); con limit, un cursor
+        // caducado (reinicio del backend) devuelve la primera página en vez de todos los chats
+        sendDelta(req, res, 'chats', filteredChats, includeGroups ? '' : '-nogroups',
+            paged ? () => sendChatPage(req, res, filteredChats) : null);
     } catch (error) {
         log(`Error getting chats: ${error.message}`, 'ERROR');
         res.status(500).json({ success: false, error: error.message });
     }
 });
 
+// Stream de eventos en tiempo real (SSE) - reemplaza el polling por chat
+app.get('/events', (req, res) => {
+    res.set({
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+    res.write(`retry: 3000\nevent: hello\ndata: ${JSON.stringify({ ready: isReady })}\n\n`);
+
+    eventStreams.add(res);
+    log(`Event stream opened (${eventStreams.size} active)`);
+
+    req.on('close', () => {
+        eventStreams.delete(res);
+        log(`Event stream closed (${eventStreams.size} active)`);
+    });
+});
+
 // API Enviar mensaje
 app.post('/send-message', async (req, res) => {
     const { to, message } = req.body;
@@ -700,8 +1049,8 @@ app.post('/sync/all', async (req, res) => {
         log('Starting full synchronization...');
         
         // Sincronizar de forma secuencial para evitar problemas
-        const freshContacts = await syncContacts();
-        const freshChats = await syncChats();
+        const freshContacts = await syncContacts({ force: true });
+        const freshChats = await syncChats({ force: true });
         
         res.json({
             success: true,
@@ -750,6 +1099,10 @@ app.post('/account/reset', async (req, res) => {
         contacts = [];
         chats = [];
         lastSync = null;
+        updateDeltaState('contacts', contacts);
+        updateDeltaState('chats', chats);
+        contactsSync.invalidate('reset');
+        chatsSync.invalidate('reset');
         
         saveData();
         
@@ -782,22 +1135,6 @@ app.post('/tokens/refresh', (req, res) => {
     }
 });
 
-// Get chat by contact ID
-app.get('/chat/:contactId', async (req, res) => {
-    const { contactId } = req.params;
-    
-    if (!isReady) {
-        return res.status(400).json({ success: false, error: 'WhatsApp not ready' });
-    }
-    
-    try {
-        const chat = await client.getChatById(contactId);
-        res.json({ success: true, chat });
-    } catch (error) {
-        res.status(404).json({ success: false, error: 'Chat not found' });
-    }
-});
-
 // Send a new message to a specific chat
 app.post('/chat/:chatId/send', async (req, res) => {
     const { chatId } = req.params;
@@ -855,6 +1192,17 @@ app.listen(port, '0.0.0.0', () => {
     loadData();
     initializeWhatsAppClient();
     
+    // Heartbeat para mantener abiertos los streams de eventos
+    setInterval(() => {
+        for (const res of eventStreams) {
+            try {
+                res.write(': ping\n\n');
+            } catch (error) {
+                eventStreams.delete(res);
+            }
+        }
+    }, EVENT_HEARTBEAT_MS);
+    
     // Refresh automático de tokens cada hora
     setInterval(() => {
         if (isAuthenticated && tokenManager.isTokenValid()) {
@@ -868,10 +1216,33 @@ app.listen(port, '0.0.0.0', () => {
 // ENDPOINT PARA MENSAJES REALES DE WHATSAPP
 // ==========================================
 
-// Obtener mensajes reales de un chat específico
+// Profundidad máxima de historial que se carga al paginar con ?before=
+const MAX_HISTORY_DEPTH = 2000;
+
+// Mensajes anteriores a beforeId: fetchMessages solo devuelve los últimos N,
+// así que se amplía la ventana (duplicando) hasta encontrar el mensaje de referencia
+async function fetchMessagesBefore(chat, beforeId, limit) {
+    let depth = limit * 2;
+    while (true) {
+        const messages = await chat.fetchMessages({ limit: depth });
+        const index = messages.findIndex(msg => msg.id._serialized === beforeId);
+        const reachedStart = messages.length < depth;
+
+        if (index >= 0) {
+            const start = Math.max(0, index - limit);
+            return { messages: messages.slice(start, index), hasMore: start > 0 || !reachedStart };
+        }
+        if (reachedStart || depth >= MAX_HISTORY_DEPTH) {
+            return { messages: [], hasMore: false };
+        }
+        depth = Math.min(depth * 2, MAX_HISTORY_DEPTH);
+    }
+}
+
+// Obtener mensajes reales de un chat específico (?before=<messageId> para páginas anteriores)
 app.get('/chat/:chatId/messages', async (req, res) => {
     const { chatId } = req.params;
-    const { limit = 30 } = req.query;
+    const { limit = 30, before } = req.query;
     
     if (!isReady) {
         return res.status(400).json({ 
@@ -888,7 +1259,15 @@ app.get('/chat/:chatId/messages', async (req, res) => {
         const chat = await client.getChatById(chatId);
         
         // Obtener mensajes reales
-        const messages = await chat.fetchMessages({ limit: parseInt(limit) });
+        const pageSize = Math.max(parseInt(limit, 10) || 30, 1);
+        let messages;
+        let hasMore;
+        if (before) {
+            ({ messages, hasMore } = await fetchMessagesBefore(chat, String(before), pageSize));
+        } else {
+            messages = await chat.fetchMessages({ limit: pageSize });
+            hasMore = messages.length >= pageSize;
+        }
         
         // Formatear mensajes con toda la información necesaria
         const formattedMessages = messages.map(msg => ({
@@ -921,6 +1300,7 @@ app.get('/chat/:chatId/messages', async (req, res) => {
             chat: chatInfo,
             messages: formattedMessages,
             messageCount: formattedMessages.length,
+            hasMore,
             timestamp: Date.now()
         });
         
@@ -952,11 +1332,13 @@ app.get('/chat/:contactId', async (req, res) => {
         log(`Fetching chat info for: ${contactId}`);
         const chat = await client.getChatById(contactId);
         
+        const lastMessage = chat.lastMessage;
         const chatData = {
             id: chat.id._serialized,
             name: chat.name,
             isGroup: chat.isGroup,
-            unreadCount: chat.unreadCount || 0
+            unreadCount: chat.unreadCount || 0,
+            lastMessage: lastMessage ? formatMessage(lastMessage) : null
         };
         
         let messages = [];
@@ -965,15 +1347,7 @@ app.get('/chat/:contactId', async (req, res) => {
         if (includeMessages === 'true') {
             try {
                 const fetchedMessages = await chat.fetchMessages({ limit: parseInt(limit) });
-                messages = fetchedMessages.map(msg => ({
-                    id: msg.id._serialized,
-                    body: msg.body || '',
-                    fromMe: msg.fromMe,
-                    timestamp: msg.timestamp,
-                    from: msg.from,
-                    type: msg.type,
-                    author: msg.author || msg.from
-                }));
+                messages = fetchedMessages.map(formatMessage);
                 log(`Fetched ${messages.length} messages for ${chat.name}`);
             } catch (msgError) {
                 log(`Could not fetch messages: ${msgError.message}`, 'WARN');